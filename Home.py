@@ -1,6 +1,13 @@
+import os
 import streamlit as st
 import pandas as pd
 import data_processing as dp
+import lineage
+import table_view as tv
+import out_of_core
+import excel_reader
+import columnar_reader
+import figure_cache
 
 st.set_page_config(
     page_title="Data-Viz : Data visualizer",
@@ -23,6 +30,29 @@ if "original_df" not in st.session_state:
     st.session_state.original_df = None
 if "last_uploaded_name" not in st.session_state:
     st.session_state.last_uploaded_name = None
+if "df_version" not in st.session_state:
+    st.session_state.df_version = None
+if "original_version" not in st.session_state:
+    st.session_state.original_version = None
+if "lineage" not in st.session_state:
+    st.session_state.lineage = None
+if "ooc_dataset" not in st.session_state:
+    st.session_state.ooc_dataset = None
+
+def start_dataset(new_df, name, ooc_dataset=None):
+    """Makes a freshly loaded frame the session's dataset and returns to the top of the page."""
+    if st.session_state.lineage is not None:
+        figure_cache.invalidate(st.session_state.lineage.versions())
+    st.session_state.ooc_dataset = ooc_dataset
+    st.session_state.lineage = lineage.Lineage(new_df, dp.new_version())
+    st.session_state.df = new_df
+    st.session_state.original_df = new_df
+    st.session_state.df_version = st.session_state.lineage.version
+    st.session_state.original_version = st.session_state.df_version
+    st.session_state.last_uploaded_name = name
+    st.success("Data loaded successfully! Head over to the **Data Overview** page.")
+    st.toast("Data loaded!")
+    st.rerun()
 
 def check_data():
     if st.session_state.df is None:
@@ -36,28 +66,115 @@ st.subheader("Upload Your Dataset")
 st.markdown("##### Start your analysis by uploading a file.")
 
 uploaded_file = st.file_uploader(
-    "Supported Formats: CSV, Excel (.xlsx, .xls)", 
-    type=["csv", "xlsx", "xls"],
+    "Supported Formats: CSV (also .gz, .bz2, .zst), Excel (.xlsx, .xlsm, .xls), Parquet, Feather, Arrow IPC", 
+    type=["csv", "gz", "bz2", "zst", "xlsx", "xlsm", "xls", "parquet", "pq", "feather", "arrow", "arrows", "ipc"],
     key="file_uploader_widget"
 )
 
 if uploaded_file:
     if st.session_state.df is None or uploaded_file.name != st.session_state.last_uploaded_name:
-        with st.spinner(f"Loading data from **{uploaded_file.name}**..."):
-            new_df = dp.load_data(uploaded_file)
-            if new_df is not None:
-                st.session_state.df = new_df
-                st.session_state.original_df = new_df.copy()
-                st.session_state.last_uploaded_name = uploaded_file.name
-                st.success("Data loaded successfully! Head over to the **Data Overview** page.")
-                st.toast("Data loaded!")
-                st.rerun() 
+        too_large = uploaded_file.size > out_of_core.OUT_OF_CORE_THRESHOLD_BYTES
+        out_of_core_upload = too_large and out_of_core.available() and out_of_core.supports(uploaded_file.name)
+        if too_large and not out_of_core_upload:
+            reason = ("DuckDB is not installed" if not out_of_core.available()
+                      else "this format can't be opened out of core")
+            st.warning(
+                f"**{uploaded_file.name}** is over {dp.format_bytes(out_of_core.OUT_OF_CORE_THRESHOLD_BYTES)}, "
+                f"but {reason}, so it is loaded fully into memory."
+            )
+        if out_of_core_upload:
+            with st.spinner(f"Converting **{uploaded_file.name}** to an on-disk columnar store..."):
+                dataset, sample = dp.load_out_of_core(uploaded_file)
+            if dataset is not None:
+                start_dataset(sample, uploaded_file.name, dataset)
+        else:
+            options = None
+            load_now = True
+            if excel_reader.is_excel(uploaded_file.name):
+                sheets = dp.excel_sheets(uploaded_file)
+                sheet_names = [sheet["name"] for sheet in sheets]
+                st.markdown("##### Workbook Options")
+                st.caption(" · ".join(
+                    f"**{sheet['name']}** ({sheet['rows']:,} rows)" if sheet["rows"] else f"**{sheet['name']}**"
+                    for sheet in sheets
+                ))
+                selected_sheets = st.multiselect(
+                    "Sheets (several are stacked with a Sheet column)", sheet_names,
+                    default=sheet_names[:1], key="excel_sheets_select"
+                )
+                c1, c2, c3 = st.columns(3)
+                header_row = c1.number_input("Header Row", min_value=1, value=1, step=1, key="excel_header_row")
+                first_row = c2.number_input("First Data Row", min_value=header_row + 1, value=None, step=1,
+                                            placeholder="Below the header", key="excel_first_row")
+                last_row = c3.number_input("Last Data Row", min_value=header_row + 1, value=None, step=1,
+                                           placeholder="End of sheet", key="excel_last_row")
+                columns = st.multiselect(
+                    "Columns (all when empty)",
+                    dp.excel_columns(uploaded_file, selected_sheets[0], header_row) if selected_sheets else [],
+                    key="excel_columns_select"
+                )
+                options = {
+                    "sheets": tuple(selected_sheets),
+                    "columns": tuple(columns) or None,
+                    "header_row": int(header_row),
+                    "first_row": None if first_row is None else int(first_row),
+                    "last_row": None if last_row is None else int(last_row),
+                }
+                load_now = st.button("Load Workbook", type="primary", key="load_workbook_btn",
+                                     disabled=not selected_sheets)
+            elif columnar_reader.is_columnar(uploaded_file.name):
+                layout = dp.columnar_layout(uploaded_file)
+                if layout is not None:
+                    groups = layout["groups"]
+                    st.markdown("##### File Options")
+                    st.caption(f"{sum(groups):,} rows × {len(layout['columns']):,} columns "
+                               f"in {len(groups):,} {layout['unit']}. Only what you select is read.")
+                    columns = st.multiselect("Columns (all when empty)", layout["columns"],
+                                             key="columnar_columns_select")
+                    selected_groups = None
+                    if len(groups) > 1:
+                        first, last = st.slider(layout["unit"].capitalize(), 1, len(groups),
+                                                (1, len(groups)), key="columnar_groups_slider")
+                        st.caption(f"Rows {sum(groups[:first - 1]) + 1:,} to {sum(groups[:last]):,}")
+                        if (first, last) != (1, len(groups)):
+                            selected_groups = tuple(range(first - 1, last))
+                    options = {"columns": tuple(columns) or None, "groups": selected_groups}
+                load_now = st.button("Load File", type="primary", key="load_columnar_btn",
+                                     disabled=layout is None)
+            if load_now:
+                with st.spinner(f"Loading data from **{uploaded_file.name}**..."):
+                    progress_bar = st.progress(0.0)
+                    preview_slot = st.empty()
+
+                    def show_progress(fraction, preview):
+                        progress_bar.progress(fraction, text=f"Parsed {fraction:.0%} of the file")
+                        if preview is not None:
+                            preview_slot.dataframe(preview, width='stretch')
+
+                    new_df = dp.load_data(uploaded_file, on_progress=show_progress, options=options)
+                if new_df is not None:
+                    start_dataset(new_df, uploaded_file.name)
+
+server_files = out_of_core.server_files() if out_of_core.available() else []
+if server_files:
+    with st.expander("Open a large file from the server (out-of-core)"):
+        server_file = st.selectbox("File", server_files, key="server_file_select")
+        if st.button("Open File", key="open_server_file_btn"):
+            with st.spinner(f"Opening **{server_file}** out of core..."):
+                dataset, sample = dp.load_out_of_core(path=os.path.join(out_of_core.DATA_DIR, server_file))
+            if dataset is not None:
+                start_dataset(sample, server_file, dataset)
 
 if st.session_state.df is not None:
     df = st.session_state.df
-    st.success(f"Current Dataset: **{df.shape[0]:,}** rows × **{df.shape[1]:,}** columns")
+    data = st.session_state.ooc_dataset or df
+    st.success(f"Current Dataset: **{data.shape[0]:,}** rows × **{data.shape[1]:,}** columns")
+    if st.session_state.ooc_dataset is not None:
+        st.info(
+            f"Out-of-core mode: summaries, histograms, box plots, density maps, search and grouping "
+            f"query the full dataset on disk; other views use a {len(df):,}-row sample."
+        )
     st.markdown("---")
     st.subheader("Data Preview")
-    st.markdown("First 5 rows.")
-    st.dataframe(df.head(), width='stretch')
+    tv.render_table(df, "home_table", version=st.session_state.df_version)
     
@@ -0,0 +1,233 @@
+"""Headless benchmarks for the data processing and plotting functions.
+
+Runs without a Streamlit server on synthetic datasets and records wall time, peak memory
+(Python heap or Arrow buffers, whichever is larger) and the JSON size of every figure sent
+to the browser. Results can be saved as a baseline and later runs compared against it::
+
+    python benchmark.py --sizes 10k 1M --save baseline.json
+    python benchmark.py --sizes 10k 1M --baseline baseline.json
+
+The comparison exits with status 1 when any metric exceeds its baseline by more than the
+configured threshold.
+"""
+import argparse
+import gc
+import io
+import json
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import streamlit as st
+from streamlit import logger as streamlit_logger
+
+import data_processing as dp
+import dataset_cache
+import dataset_store
+import visualization as viz
+
+SIZES = {"10k": 10_000, "100k": 100_000, "1M": 1_000_000, "10M": 10_000_000}
+DEFAULT_SIZES = ["10k", "1M"]
+THRESHOLDS = {"seconds": 1.25, "peak_bytes": 1.25, "payload_bytes": 1.10}
+# Timings below this are too noisy to flag.
+MIN_SECONDS = 0.05
+
+
+def make_dataset(n_rows, null_fraction=0.05, cardinality=50, seed=0):
+    """Builds a mixed-dtype frame with nulls sprinkled over every column but the id."""
+    rng = np.random.default_rng(seed)
+    categories = np.array([f"cat_{i}" for i in range(cardinality)], dtype=object)
+    df = pd.DataFrame({
+        "id": np.arange(n_rows, dtype=np.int64),
+        "normal": rng.normal(50, 10, n_rows),
+        "skewed": rng.lognormal(0, 1, n_rows),
+        "count": rng.poisson(20, n_rows).astype(np.int64),
+        "ratio": rng.random(n_rows),
+        "category": categories[rng.integers(0, cardinality, n_rows)],
+        "segment": np.array(["north", "south", "east", "west"], dtype=object)[rng.integers(0, 4, n_rows)],
+        "flag": rng.random(n_rows) < 0.3,
+        "timestamp": pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 365 * 86400, n_rows), unit="s"),
+    })
+    for col in df.columns[1:]:
+        missing = rng.random(n_rows) < null_fraction
+        if df[col].dtype == np.int64:
+            df[col] = df[col].astype("Int64")
+        elif df[col].dtype == bool:
+            df[col] = df[col].astype("boolean")
+        df.loc[missing, col] = None
+    return df
+
+
+def to_csv_upload(df, name="benchmark.csv"):
+    """Serializes ``df`` into an in-memory CSV that looks like a Streamlit upload."""
+    sink = pa.BufferOutputStream()
+    pacsv.write_csv(pa.Table.from_pandas(df, preserve_index=False), sink)
+    upload = io.BytesIO(sink.getvalue().to_pybytes())
+    upload.name = name
+    upload.size = upload.getbuffer().nbytes
+    return upload
+
+
+@contextmanager
+def capture_figures():
+    """Collects the figures handed to ``st.plotly_chart`` instead of rendering them."""
+    figures = []
+    with mock.patch.object(st, "plotly_chart", lambda fig, **kwargs: figures.append(fig)):
+        yield figures
+
+
+def _run(func):
+    with capture_figures() as figures:
+        func()
+    return sum(len(fig.to_json()) for fig in figures)
+
+
+def measure(func, repeat=3):
+    """Best wall time over ``repeat`` runs, peak memory of one more run, and payload.
+
+    One untimed run goes first so lazy imports and first-call setup are not counted. The
+    peak is the larger of tracemalloc's, which misses Arrow buffers, and that of a fresh
+    Arrow memory pool installed as the default for the run.
+    """
+    payload = _run(func)
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        payload = _run(func)
+        times.append(time.perf_counter() - start)
+    gc.collect()
+    default_pool = pa.default_memory_pool()
+    arrow_pool = pa.proxy_memory_pool(default_pool)
+    pa.set_memory_pool(arrow_pool)
+    tracemalloc.start()
+    try:
+        _run(func)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+        pa.set_memory_pool(default_pool)
+    peak = max(peak, arrow_pool.max_memory())
+    return {"seconds": min(times), "peak_bytes": peak, "payload_bytes": payload}
+
+
+def cases(df, upload):
+    """Benchmarked calls as ``(name, callable)``; all run uncached (no version token)."""
+    num = ["normal", "skewed", "count", "ratio"]
+    return [
+        ("load_data", lambda: (upload.seek(0), dp.load_data(upload))),
+        ("get_summary", lambda: dp.get_summary(df)),
+        ("clean_missing[mean]", lambda: dp.clean_missing(df, "mean", num)),
+        ("clean_missing[drop_rows]", lambda: dp.clean_missing(df, "drop_rows", num)),
+        ("clean_missing[mode]", lambda: dp.clean_missing(df, "mode", num + ["category", "segment"])),
+        ("clean_missing[group_median]", lambda: dp.clean_missing(df, "group_median", num, group_col="segment")),
+        ("clean_missing[ffill]", lambda: dp.clean_missing(df, "ffill", num, order_col="timestamp")),
+        ("clean_missing[knn]", lambda: dp.clean_missing(df, "knn", num)),
+        ("remove_outliers_iqr", lambda: dp.remove_outliers_iqr(df, num)),
+        ("group_by", lambda: dp.group_by(df, ["category", "segment"], num, ["mean", "count", "median"])),
+        ("plot_histogram", lambda: viz.plot_histogram(df, "skewed")),
+        ("plot_box_plot", lambda: viz.plot_box_plot(df, "normal", "category")),
+        ("plot_bar_chart_categorical", lambda: viz.plot_bar_chart_categorical(df, "category")),
+        ("plot_scatter", lambda: viz.plot_scatter(df, "normal", "skewed", "segment")),
+        ("plot_density_heatmap", lambda: viz.plot_density_heatmap(df, "normal", "skewed")),
+        ("plot_correlation_heatmap", lambda: viz.plot_correlation_heatmap(df)),
+        ("plot_missing_data_heatmap", lambda: viz.plot_missing_data_heatmap(df)),
+        ("plot_pairplot", lambda: viz.plot_pairplot(df, num)),
+    ]
+
+
+def run(sizes, repeat=3, null_fraction=0.05, cardinality=50, only=None, log=print):
+    """Runs every case on each dataset size; returns results keyed ``"<size>/<case>"``."""
+    results = {}
+    # Neither the on-disk cache nor the shared in-memory store may serve load_data.
+    with tempfile.TemporaryDirectory() as cache_dir, \
+            mock.patch.object(dataset_cache, "CACHE_DIR", cache_dir), \
+            mock.patch.object(dataset_cache, "get", lambda key: None), \
+            mock.patch.object(dataset_store, "get_or_load", lambda key, loader, name=None: loader()):
+        for size in sizes:
+            df = make_dataset(SIZES[size], null_fraction, cardinality)
+            upload = to_csv_upload(df)
+            df = dp.optimize_dtypes(df)
+            for name, func in cases(df, upload):
+                if only and not any(pattern in name for pattern in only):
+                    continue
+                result = measure(func, repeat)
+                results[f"{size}/{name}"] = result
+                log(f"{size:>5} {name:<28} {result['seconds']:9.3f}s "
+                    f"{dp.format_bytes(result['peak_bytes']):>10} peak "
+                    f"{dp.format_bytes(result['payload_bytes']):>10} payload")
+            del df, upload
+    return results
+
+
+def compare(results, baseline, thresholds=THRESHOLDS):
+    """Lists ``(key, metric, baseline, current, ratio)`` for every metric over its threshold."""
+    regressions = []
+    for key, current in results.items():
+        previous = baseline.get(key)
+        if previous is None:
+            continue
+        for metric, limit in thresholds.items():
+            before, after = previous.get(metric, 0), current[metric]
+            if metric == "seconds" and after < MIN_SECONDS:
+                continue
+            if before and after / before > limit:
+                regressions.append((key, metric, before, after, after / before))
+    return regressions
+
+
+def environment():
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "pyarrow": pa.__version__,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--sizes", nargs="+", choices=list(SIZES), default=DEFAULT_SIZES)
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per case; the best is kept.")
+    parser.add_argument("--nulls", type=float, default=0.05, help="Fraction of missing cells per column.")
+    parser.add_argument("--cardinality", type=int, default=50, help="Distinct values in 'category'.")
+    parser.add_argument("--only", nargs="+", help="Only run cases whose name contains one of these.")
+    parser.add_argument("--save", help="Write the results to this JSON file.")
+    parser.add_argument("--baseline", help="Compare against results saved with --save.")
+    for metric, default in THRESHOLDS.items():
+        parser.add_argument(f"--max-{metric.replace('_', '-')}-ratio", type=float, default=default,
+                            dest=metric, help=f"Allowed {metric} growth over the baseline.")
+    args = parser.parse_args(argv)
+    # Bare-mode warnings from every st.* call would drown the report.
+    streamlit_logger.set_log_level("error")
+
+    results = run(args.sizes, args.repeat, args.nulls, args.cardinality, args.only)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({"environment": environment(), "results": results}, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        thresholds = {metric: getattr(args, metric) for metric in THRESHOLDS}
+        regressions = compare(results, baseline, thresholds)
+        for key, metric, before, after, ratio in regressions:
+            print(f"REGRESSION {key} {metric}: {before:,.3f} -> {after:,.3f} ({ratio:.2f}x)")
+        if regressions:
+            return 1
+        print("No regressions against the baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
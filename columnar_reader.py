@@ -0,0 +1,113 @@
+"""Parquet, Feather and Arrow IPC ingestion with column and row-group projection.
+
+Uploads are read zero-copy from the upload buffer and files on disk are memory-mapped;
+only the selected columns, and the selected row groups (record batches for Feather and
+IPC), are decoded.
+"""
+import os
+
+import pyarrow as pa
+import pyarrow.ipc as ipc
+import pyarrow.parquet as pq
+
+PARQUET_EXTENSIONS = ('.parquet', '.pq')
+IPC_EXTENSIONS = ('.feather', '.arrow', '.arrows', '.ipc')
+# Codecs Arrow's CSV reader can decompress on the fly, by file suffix.
+CSV_COMPRESSION = {'.csv.gz': 'gzip', '.csv.bz2': 'bz2', '.csv.zst': 'zstd'}
+
+
+def is_columnar(name):
+    return name.lower().endswith(PARQUET_EXTENSIONS + IPC_EXTENSIONS)
+
+
+def csv_compression(name):
+    """Arrow codec of a compressed CSV name, or None."""
+    for suffix, codec in CSV_COMPRESSION.items():
+        if name.lower().endswith(suffix):
+            return codec
+    return None
+
+
+def is_csv(name):
+    return name.lower().endswith('.csv') or csv_compression(name) is not None
+
+
+def _source(file_obj):
+    """A zero-copy Arrow reader over an upload's buffer, or a memory map of a path."""
+    if isinstance(file_obj, (str, os.PathLike)):
+        return pa.memory_map(os.fspath(file_obj))
+    return pa.BufferReader(pa.py_buffer(file_obj.getbuffer()))
+
+
+def _name(file_obj):
+    return os.fspath(file_obj) if isinstance(file_obj, (str, os.PathLike)) else file_obj.name
+
+
+def _open_ipc(file_obj, fields=None):
+    """Opens the IPC file format (Feather v2) or, failing that, the IPC stream format."""
+    options = None if fields is None else ipc.IpcReadOptions(included_fields=fields)
+    try:
+        return ipc.open_file(_source(file_obj), options=options)
+    except pa.ArrowInvalid:
+        return ipc.open_stream(_source(file_obj), options=options)
+
+
+def describe(file_obj):
+    """Column names and the row count of each row group (or record batch) without reading data.
+
+    Returns a dict with ``columns``, ``groups`` (rows per group) and ``unit``, the name of
+    a group in this format.
+    """
+    if _name(file_obj).lower().endswith(PARQUET_EXTENSIONS):
+        parquet = pq.ParquetFile(_source(file_obj))
+        metadata = parquet.metadata
+        return {
+            "columns": parquet.schema_arrow.names,
+            "groups": [metadata.row_group(i).num_rows for i in range(metadata.num_row_groups)],
+            "unit": "row groups",
+        }
+    columns = _open_ipc(file_obj).schema.names
+    # Decoding a single column is enough to learn each batch's length.
+    reader = _open_ipc(file_obj, fields=[0]) if columns else None
+    if reader is None:
+        groups = []
+    elif isinstance(reader, ipc.RecordBatchFileReader):
+        groups = [reader.get_batch(i).num_rows for i in range(reader.num_record_batches)]
+    else:
+        groups = [batch.num_rows for batch in reader]
+    return {"columns": columns, "groups": groups, "unit": "record batches"}
+
+
+def record_batches(file_obj):
+    """Schema of a Feather or Arrow IPC file and an iterator decoding its record batches
+    one at a time."""
+    reader = _open_ipc(file_obj)
+    if isinstance(reader, ipc.RecordBatchFileReader):
+        return reader.schema, (reader.get_batch(i) for i in range(reader.num_record_batches))
+    return reader.schema, iter(reader)
+
+
+def read_table(file_obj, columns=None, groups=None):
+    """Reads the selected ``columns`` and ``groups`` (indices of row groups or record
+    batches) of a Parquet, Feather or Arrow IPC file into an Arrow table; None means all.
+    """
+    if _name(file_obj).lower().endswith(PARQUET_EXTENSIONS):
+        parquet = pq.ParquetFile(_source(file_obj))
+        columns = None if columns is None else [col for col in columns if col in parquet.schema_arrow.names]
+        if groups is None:
+            return parquet.read(columns=columns)
+        return parquet.read_row_groups(list(groups), columns=columns)
+
+    fields = None
+    if columns is not None:
+        schema = _open_ipc(file_obj).schema
+        fields = [schema.get_field_index(col) for col in columns if col in schema.names]
+    reader = _open_ipc(file_obj, fields)
+    if groups is None:
+        return reader.read_all()
+    if isinstance(reader, ipc.RecordBatchFileReader):
+        batches = [reader.get_batch(i) for i in groups]
+    else:
+        wanted = set(groups)
+        batches = [batch for i, batch in enumerate(reader) if i in wanted]
+    return pa.Table.from_batches(batches, schema=reader.schema)
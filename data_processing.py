@@ -1,6 +1,24 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import io
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+import dataset_cache
+import columnar_reader
+import dataset_store
+import excel_reader
+import instrumentation as tr
+import sketches as sk
+import out_of_core
+import table_view as tv
+from scipy.cluster import hierarchy
+from scipy.spatial.distance import squareform
+from sklearn.ensemble import IsolationForest
+from sklearn.neighbors import NearestNeighbors
 
 st.markdown("""
     <style>
@@ -10,103 +28,869 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 st.logo("assets/logo.svg",size="large")
-@st.cache_data
-def load_data(uploaded_file):
-    """Loads data from a file, supports CSV and Excel."""
+CSV_BLOCK_BYTES = 16 << 20
+PREVIEW_ROWS = 5
+
+def _nullable_dtype(pa_type):
+    """Maps an Arrow type to the pandas nullable dtype that convert_dtypes would pick."""
+    if pa.types.is_integer(pa_type):
+        return pd.Int64Dtype()
+    if pa.types.is_floating(pa_type):
+        return pd.Float64Dtype()
+    if pa.types.is_boolean(pa_type):
+        return pd.BooleanDtype()
+    if pa.types.is_string(pa_type) or pa.types.is_large_string(pa_type):
+        return pd.StringDtype()
+    return None
+
+def arrow_to_pandas(table, **options):
+    """Converts an Arrow table to nullable pandas dtypes; dates load as ``datetime64``
+    like timestamps do."""
+    return table.to_pandas(types_mapper=_nullable_dtype, date_as_object=False, **options)
+
+def read_csv_streaming(source, on_progress=None, block_size=CSV_BLOCK_BYTES, compression=None):
+    """Parses a CSV block by block with Arrow's multi-threaded reader.
+
+    Column types are inferred from the first block and each block is kept in Arrow memory
+    until the end, where columns are converted to nullable pandas dtypes one at a time.
+    ISO-formatted date and timestamp columns load as ``datetime64`` rather than text.
+    ``compression`` names an Arrow codec ('gzip', 'bz2', 'zstd') to decompress on the fly.
+    ``on_progress(fraction, preview)`` is called after every block; ``preview`` holds the
+    first rows on the first call and is None afterwards.
+    """
+    source.seek(0, io.SEEK_END)
+    total = source.tell()
+    source.seek(0)
+
+    stream = source
+    if compression is not None:
+        # Progress still follows the compressed bytes consumed from ``source``.
+        stream = pa.CompressedInputStream(pa.PythonFile(source, mode='r'), compression)
+    reader = pacsv.open_csv(
+        stream,
+        read_options=pacsv.ReadOptions(block_size=block_size, use_threads=True),
+        # Like pandas, treat empty, NA, N/A, ... text cells as missing rather than literal strings.
+        convert_options=pacsv.ConvertOptions(strings_can_be_null=True, quoted_strings_can_be_null=True),
+    )
+    batches = []
+    for batch in reader:
+        if on_progress is not None:
+            preview = None
+            if not batches:
+                preview = arrow_to_pandas(pa.Table.from_batches([batch]).slice(0, PREVIEW_ROWS))
+            on_progress(min(source.tell() / total, 1.0) if total else 1.0, preview)
+        batches.append(batch)
+
+    table = pa.Table.from_batches(batches, schema=reader.schema)
+    del batches
+    # self_destruct frees each Arrow column once converted, so peak memory stays near 1x.
+    return arrow_to_pandas(table, self_destruct=True, split_blocks=True)
+
+def read_columnar(source, columns=None, groups=None):
+    """Reads a Parquet, Feather or Arrow IPC file into nullable pandas dtypes, decoding only
+    the selected columns and row groups."""
+    table = columnar_reader.read_table(source, columns, groups)
+    return arrow_to_pandas(table, self_destruct=True, split_blocks=True)
+
+@tr.traced
+def _parse_file(uploaded_file, on_progress=None, options=None):
+    """Parses an uploaded file into a DataFrame with nullable dtypes.
+
+    ``options`` narrows what is read: sheets, columns and row range for Excel files (see
+    ``excel_reader.read_workbook``), columns and row groups for columnar files.
+    """
+    name = uploaded_file.name
+    if columnar_reader.is_csv(name):
+        compression = columnar_reader.csv_compression(name)
+        try:
+            return read_csv_streaming(uploaded_file, on_progress=on_progress, compression=compression)
+        except pa.ArrowInvalid:
+            # A later block disagreed with the types inferred from the first one.
+            uploaded_file.seek(0)
+            df = pd.read_csv(uploaded_file, low_memory=False, compression=compression)
+    elif columnar_reader.is_columnar(name):
+        return read_columnar(uploaded_file, **(options or {}))
+    elif excel_reader.is_excel(name):
+        df = excel_reader.read_workbook(uploaded_file, on_progress=on_progress, **(options or {}))
+    else:
+        raise ValueError("Unsupported file type. Please use CSV, Excel, Parquet, Feather or Arrow IPC.")
+    return df.convert_dtypes()
+
+CATEGORY_MAX_RATIO = 0.5
+CATEGORY_MAX_UNIQUE = 10_000
+
+def _optimized_column(series):
+    """Returns the most compact dtype conversion of one column that loses no information."""
+    dtype = series.dtype
+    if pd.api.types.is_bool_dtype(dtype):
+        return series
+
+    if pd.api.types.is_integer_dtype(dtype):
+        lo, hi = series.min(), series.max()
+        if pd.isna(lo):
+            return series
+        for target in ('Int8', 'Int16', 'Int32'):
+            info = np.iinfo(target.lower())
+            if info.min <= lo and hi <= info.max:
+                return series.astype(target) if str(dtype) != target else series
+        return series
+
+    if pd.api.types.is_float_dtype(dtype) and series.dtype.itemsize > 4:
+        values = series.to_numpy(dtype='float64', na_value=np.nan)
+        with np.errstate(over='ignore'):
+            narrowed = values.astype(np.float32)
+        if np.array_equal(narrowed.astype(np.float64), values, equal_nan=True):
+            return series.astype('Float32' if isinstance(dtype, pd.Float64Dtype) else 'float32')
+        return series
+
+    if pd.api.types.is_string_dtype(dtype) and not isinstance(dtype, pd.CategoricalDtype):
+        non_null = series.count()
+        n_unique = series.nunique()
+        if non_null and n_unique <= CATEGORY_MAX_UNIQUE and n_unique / non_null <= CATEGORY_MAX_RATIO:
+            return series.astype('category')
+        if getattr(dtype, 'storage', None) != 'pyarrow':
+            try:
+                return series.astype(pd.StringDtype('pyarrow'))
+            except (TypeError, ValueError, pa.ArrowException):
+                return series
+    return series
+
+@tr.traced
+def optimize_dtypes(df):
+    """Downcasts numbers where values fit, turns low-cardinality text into categories and
+    stores other text as Arrow strings.
+
+    The optimized frame's ``attrs['memory_before']`` maps each changed column to its
+    original ``(dtype, bytes)`` so pages can report the savings.
+    """
+    columns = {}
+    before = {}
+    for col in df.columns:
+        series = df[col]
+        optimized = _optimized_column(series)
+        if optimized is not series:
+            before[col] = (str(series.dtype), int(series.memory_usage(deep=True, index=False)))
+        columns[col] = optimized
+    optimized_df = pd.DataFrame(columns, index=df.index)
+    optimized_df.attrs['memory_before'] = before
+    return optimized_df
+
+def memory_report(df):
+    """Per-column memory now versus before dtype optimization, largest savings first."""
+    before = df.attrs.get('memory_before', {})
+    after = df.memory_usage(deep=True, index=False)
+    report = pd.DataFrame({
+        'Type Before': [before.get(col, (str(df[col].dtype), 0))[0] for col in df.columns],
+        'Type After': df.dtypes.astype(str).values,
+        'Bytes Before': [before.get(col, (None, after[col]))[1] for col in df.columns],
+        'Bytes After': after.values,
+    }, index=pd.Index(df.columns, name='Column'))
+    report['Saved'] = report['Bytes Before'] - report['Bytes After']
+    return report.sort_values('Saved', ascending=False)
+
+@tr.traced
+def load_data(uploaded_file, on_progress=None, options=None):
+    """Loads data from a file, supports CSV (optionally compressed), Excel, Parquet, Feather
+    and Arrow IPC. ``options`` narrows what is read, see ``_parse_file``.
+
+    Sessions opening the same contents share one immutable frame from the dataset store.
+    Parsed frames are also kept in the on-disk dataset cache, so a repeat upload skips
+    parsing entirely, even across restarts.
+    """
     if uploaded_file is None:
         return None
     try:
-        if uploaded_file.name.endswith('.csv'):
-            df = pd.read_csv(uploaded_file, low_memory=False)
-        elif uploaded_file.name.endswith(('.xlsx', '.xls')):
-            df = pd.read_excel(uploaded_file, engine='openpyxl')
-        else:
-            st.error("Unsupported file type. Please use CSV or Excel.")
-            return None
-            
-        return df.convert_dtypes()
+        key = dataset_cache.cache_key(uploaded_file, **(options or {}))
+
+        def load():
+            df = dataset_cache.get(key)
+            if df is None:
+                df = optimize_dtypes(_parse_file(uploaded_file, on_progress, options))
+                dataset_cache.put(key, df)
+            return df
+
+        return dataset_store.get_or_load(key, load, name=getattr(uploaded_file, "name", None))
     except Exception as e:
         st.error(f"Error loading data: {e}")
         return None
 
-def get_summary(df):
-    """Generates a detailed summary DataFrame of the input DataFrame."""
-    if df is None or df.empty:
+@st.cache_data(show_spinner=False, max_entries=32)
+def _cached_excel_sheets(_uploaded_file, file_id):
+    return excel_reader.list_sheets(_uploaded_file)
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def _cached_excel_columns(_uploaded_file, file_id, sheet, header_row):
+    return excel_reader.sheet_columns(_uploaded_file, sheet, header_row)
+
+def excel_sheets(uploaded_file):
+    """Sheets of an uploaded workbook, listed once per upload."""
+    try:
+        return _cached_excel_sheets(uploaded_file, uploaded_file.file_id)
+    except Exception as e:
+        st.error(f"Error reading workbook: {e}")
+        return []
+
+def excel_columns(uploaded_file, sheet, header_row=1):
+    """Header names of one sheet of an uploaded workbook."""
+    try:
+        return _cached_excel_columns(uploaded_file, uploaded_file.file_id, sheet, header_row)
+    except Exception as e:
+        st.error(f"Error reading workbook: {e}")
+        return []
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def _cached_columnar_layout(_uploaded_file, file_id):
+    return columnar_reader.describe(_uploaded_file)
+
+def columnar_layout(uploaded_file):
+    """Columns and row groups of an uploaded columnar file, read once per upload."""
+    try:
+        return _cached_columnar_layout(uploaded_file, uploaded_file.file_id)
+    except Exception as e:
+        st.error(f"Error reading file: {e}")
+        return None
+
+@tr.traced
+def load_out_of_core(uploaded_file=None, path=None):
+    """Opens a large file out of core (see ``out_of_core.supports``).
+
+    Returns the DuckDB-backed dataset and an in-memory row sample for the plots that need
+    individual rows, or ``(None, None)`` on failure.
+    """
+    try:
+        if path is None:
+            key = dataset_cache.cache_key(uploaded_file, mode="out_of_core")
+            parquet_path = out_of_core.convert_upload(uploaded_file, key)
+        else:
+            parquet_path = out_of_core.convert_path(path)
+        dataset = out_of_core.open_dataset(parquet_path)
+        sample = arrow_to_pandas(dataset.sample())
+        return dataset, optimize_dtypes(sample)
+    except Exception as e:
+        st.error(f"Error loading data: {e}")
+        return None, None
+
+PROFILE_CHUNK_ROWS = 1_000_000
+PROFILE_BATCH_COLS = 8
+
+def new_version():
+    """Returns a fresh token identifying one state of the dataset, used as a cache key."""
+    return uuid.uuid4().hex
+
+def _sketches_distinct(series):
+    """Whether approximate mode sketches a column's distinct count: text and floats, whose
+    hash tables are slow. Integer, boolean, categorical and datetime values count exactly
+    about as fast."""
+    return pd.api.types.is_float_dtype(series) or (
+        pd.api.types.is_string_dtype(series) and not isinstance(series.dtype, pd.CategoricalDtype))
+
+def _profile_column(series, numeric, chunk_rows=PROFILE_CHUNK_ROWS, approx=False):
+    """Profiles one column in a single chunked pass: nulls, distinct values and moments.
+
+    With ``approx``, distinct text and float values are estimated with a HyperLogLog
+    sketch instead of being collected.
+    """
+    n_total = len(series)
+    missing = 0
+    uniques = []
+    distinct_sketch = sk.HyperLogLog() if approx and _sketches_distinct(series) else None
+    count, mean, m2 = 0, 0.0, 0.0
+    col_min, col_max = np.inf, -np.inf
+
+    for start in range(0, n_total, chunk_rows):
+        chunk = series.iloc[start:start + chunk_rows]
+        null_mask = chunk.isna().to_numpy()
+        missing += int(null_mask.sum())
+        valid = chunk[~null_mask]
+        if distinct_sketch is not None:
+            distinct_sketch.update(valid)
+        else:
+            uniques.append(pd.Series(valid.unique(), dtype=series.dtype))
+
+        if numeric and len(valid):
+            values = valid.to_numpy(dtype='float64')
+            n_chunk = len(values)
+            chunk_mean = values.mean()
+            chunk_m2 = ((values - chunk_mean) ** 2).sum()
+            # Chan et al. parallel merge of (count, mean, M2) across chunks.
+            delta = chunk_mean - mean
+            total = count + n_chunk
+            mean += delta * n_chunk / total
+            m2 += chunk_m2 + delta ** 2 * count * n_chunk / total
+            count = total
+            col_min = min(col_min, values.min())
+            col_max = max(col_max, values.max())
+
+    if distinct_sketch is not None:
+        distinct = int(round(distinct_sketch.estimate()))
+    else:
+        distinct = pd.concat(uniques, ignore_index=True).nunique() if uniques else 0
+    row = {
+        'Column': series.name,
+        'Type': str(series.dtype),
+        'Non-Null': n_total - missing,
+        'Missing': missing,
+        '% Missing': round(missing / n_total * 100, 2) if n_total else 0.0,
+        'Unique': distinct,
+    }
+    if approx:
+        row['Unique ± (95%)'] = 0 if distinct_sketch is None else int(
+            np.ceil(2 * distinct_sketch.relative_error * distinct))
+    if numeric:
+        row.update({
+            'mean': mean if count else np.nan,
+            'std': np.sqrt(m2 / (count - 1)) if count > 1 else np.nan,
+            'min': col_min if count else np.nan,
+            'max': col_max if count else np.nan,
+        })
+    return row
+
+def _profile_batch(df, cols, numeric_cols, approx=False):
+    """Profiles a batch of columns; runs inside a worker thread."""
+    return [_profile_column(df[col], col in numeric_cols, approx=approx) for col in cols]
+
+def profile_columns(df, max_workers=None, approx=False):
+    """Profiles every column in one fused pass, spreading column batches across cores."""
+    if out_of_core.is_out_of_core(df):
+        return df.summary()
+    numeric_cols = set(df.select_dtypes(include=np.number).columns)
+    cols = df.columns.tolist()
+    batches = [cols[i:i + PROFILE_BATCH_COLS] for i in range(0, len(cols), PROFILE_BATCH_COLS)]
+    workers = min(max_workers or os.cpu_count() or 1, len(batches))
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = pool.map(lambda batch: _profile_batch(df, batch, numeric_cols, approx), batches)
+        rows = [row for batch_rows in results for row in batch_rows]
+
+    columns = ['Column', 'Type', 'Non-Null', 'Missing', '% Missing', 'Unique', 'mean', 'std', 'min', 'max']
+    if approx:
+        columns.insert(6, 'Unique ± (95%)')
+    summary = pd.DataFrame(rows, columns=columns)
+    if not numeric_cols:
+        summary = summary.drop(columns=['mean', 'std', 'min', 'max'])
+    return summary.set_index('Column')
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def _cached_summary(_df, version, approx):
+    return profile_columns(_df, approx=approx)
+
+@tr.traced
+def get_summary(df, version=None, approx=False):
+    """Generates a detailed summary DataFrame of the input DataFrame.
+
+    When a dataset version token is given, the result is cached and shared across pages.
+    ``approx`` estimates distinct counts with sketches and adds their 95% error bound.
+    """
+    if df is None or (not out_of_core.is_out_of_core(df) and df.empty):
         return pd.DataFrame()
-    
-    summary = pd.DataFrame({
-        'Column': df.columns,
-        'Type': df.dtypes.astype(str),
-        'Non-Null': df.count().values,
-        'Missing': df.isnull().sum().values,
-        '% Missing': (df.isnull().sum() / len(df) * 100).round(2),
-        'Unique': df.nunique().values,
+    if version is None:
+        return profile_columns(df, approx=approx)
+    return _cached_summary(df, version, approx)
+
+PEARSON_CHUNK_ROWS = 100_000
+
+def _pairwise_pearson(X, chunk_rows=PEARSON_CHUNK_ROWS):
+    """Pearson correlation of the columns of ``X`` using pairwise-complete observations.
+
+    With no missing values the columns are standardized once and correlated with a single
+    matrix multiply; otherwise per-pair sums are gathered with four masked multiplies,
+    accumulated over ``chunk_rows`` rows at a time to bound the temporaries.
+    Returns ``(corr, counts)``.
+    """
+    present = ~np.isnan(X)
+    if present.all():
+        n = X.shape[0]
+        Z = X - X.mean(axis=0)
+        norms = np.sqrt((Z ** 2).sum(axis=0))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            Z /= norms
+        corr = Z.T @ Z
+        return corr, np.full(corr.shape, n, dtype=np.int64)
+
+    p = X.shape[1]
+    totals = np.zeros(p)
+    for start in range(0, len(X), chunk_rows):
+        totals += np.where(present[start:start + chunk_rows], X[start:start + chunk_rows], 0.0).sum(axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # Centre first so the sums below don't lose precision to large offsets.
+        means = np.nan_to_num(totals / present.sum(axis=0))
+    n, sx, sxx, sxy = (np.zeros((p, p)) for _ in range(4))
+    for start in range(0, len(X), chunk_rows):
+        mask = present[start:start + chunk_rows]
+        M = mask.astype(np.float64)
+        Xz = np.where(mask, X[start:start + chunk_rows] - means, 0.0)
+        n += M.T @ M
+        sx += Xz.T @ M
+        sxx += (Xz ** 2).T @ M
+        sxy += Xz.T @ Xz
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cov = sxy - sx * sx.T / n
+        var_x = sxx - sx ** 2 / n
+        corr = cov / np.sqrt(var_x * var_x.T)
+    return corr, n.round().astype(np.int64)
+
+def correlation_matrix(df, method="pearson", cols=None):
+    """Pearson or Spearman correlation matrix of the numerical columns, using NumPy.
+
+    Spearman ranks each column once over all its values before correlating, so with
+    missing values it approximates pandas' per-pair re-ranking.
+    """
+    cols = df.select_dtypes(include='number').columns.tolist() if cols is None else cols
+    data = df[cols]
+    if method == "spearman":
+        data = data.rank()
+    X = np.column_stack([data[col].to_numpy(dtype='float64', na_value=np.nan) for col in cols]) \
+        if cols else np.empty((len(df), 0))
+    corr, counts = _pairwise_pearson(X)
+    corr = np.clip(corr, -1.0, 1.0)
+    np.fill_diagonal(corr, np.where(np.isfinite(corr.diagonal()), 1.0, np.nan))
+    corr[counts < 2] = np.nan
+    return pd.DataFrame(corr, index=cols, columns=cols), pd.DataFrame(counts, index=cols, columns=cols)
+
+def top_correlated_pairs(corr, k=20):
+    """The ``k`` column pairs with the largest absolute correlation."""
+    values = corr.to_numpy()
+    rows, cols = np.triu_indices(len(values), k=1)
+    pair_values = values[rows, cols]
+    valid = ~np.isnan(pair_values)
+    rows, cols, pair_values = rows[valid], cols[valid], pair_values[valid]
+    order = np.argsort(-np.abs(pair_values), kind='stable')[:k]
+    names = corr.columns
+    return pd.DataFrame({
+        'Column A': names[rows[order]],
+        'Column B': names[cols[order]],
+        'Correlation': pair_values[order],
     })
-    
-    numerical_cols = df.select_dtypes(include=np.number).columns
-    if not numerical_cols.empty:
-        desc = df[numerical_cols].describe().T.reset_index()
-        desc.rename(columns={'index': 'Column'}, inplace=True)
-        summary = pd.merge(summary, desc[['Column', 'mean', 'std', 'min', 'max']], 
-                           on='Column', how='left')
-    
-    return summary.set_index('Column')
 
-def clean_missing(df, strategy, cols):
-    """Handles missing values based on the selected strategy."""
+def cluster_order(corr):
+    """Orders columns so strongly correlated ones sit together (average-linkage on 1 - |r|)."""
+    if len(corr) < 3:
+        return corr.columns.tolist()
+    distance = 1 - np.abs(np.nan_to_num(corr.to_numpy()))
+    np.fill_diagonal(distance, 0.0)
+    condensed = squareform(np.clip((distance + distance.T) / 2, 0, None), checks=False)
+    order = hierarchy.leaves_list(hierarchy.linkage(condensed, method='average'))
+    return corr.columns[order].tolist()
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def _cached_correlation(_df, version, method):
+    corr, _ = correlation_matrix(_df, method)
+    return corr, cluster_order(corr)
+
+@tr.traced
+def get_correlation(df, method="pearson", version=None):
+    """Returns ``(corr, clustered_order)``, cached per dataset version and method."""
+    if version is None:
+        corr, _ = correlation_matrix(df, method)
+        return corr, cluster_order(corr)
+    return _cached_correlation(df, version, method)
+
+GROUPBY_FUNCS = ["mean", "sum", "count", "min", "max", "std", "median", "p25", "p75", "p90", "p99"]
+GROUPBY_QUANTILES = {"median": 0.5, "p25": 0.25, "p75": 0.75, "p90": 0.9, "p99": 0.99}
+QUANTILE_SAMPLE_ROWS = 1_000_000
+
+@st.cache_resource(max_entries=32, show_spinner=False)
+def _cached_key_codes(_df, version, col):
+    return pd.factorize(_df[col])
+
+def key_codes(df, col, version=None):
+    """Factorized ``(codes, uniques)`` of a group key column, shared per dataset version."""
+    if version is None:
+        return pd.factorize(df[col])
+    return _cached_key_codes(df, version, col)
+
+@tr.traced
+def group_by(df, keys, values, funcs, version=None, rows=None, approx_quantiles=False):
+    """Aggregates several value columns with several functions over one or more keys.
+
+    Key columns are factorized once per dataset version and combined into integer group ids,
+    so repeated aggregations only pay for the aggregation itself. ``rows`` restricts the
+    work to a subset of row positions. With ``approx_quantiles``, quantiles come from a
+    uniform sample of at most ``QUANTILE_SAMPLE_ROWS`` rows. Rows with a missing key are
+    dropped, as in pandas. Out-of-core datasets run the aggregation as a DuckDB query.
+    """
+    if out_of_core.is_out_of_core(df):
+        return df.group_by(keys, values, funcs, approx_quantiles)
+    n_rows = len(df) if rows is None else len(rows)
+    group_ids = np.zeros(n_rows, dtype=np.int64)
+    valid = np.ones(n_rows, dtype=bool)
+    for key in keys:
+        codes, uniques = key_codes(df, key, version)
+        if rows is not None:
+            codes = codes[rows]
+        valid &= codes >= 0
+        group_ids, _ = pd.factorize(group_ids * len(uniques) + codes)
+
+    positions = np.flatnonzero(valid) if rows is None else np.asarray(rows)[valid]
+    group_ids, _ = pd.factorize(group_ids[valid])
+    _, first = np.unique(group_ids, return_index=True)
+
+    result = pd.DataFrame({key: df[key].iloc[positions[first]].to_numpy() for key in keys})
+    frame = pd.DataFrame({
+        col: (df[col].to_numpy(dtype='float64', na_value=np.nan)
+              if pd.api.types.is_numeric_dtype(df[col]) and not pd.api.types.is_bool_dtype(df[col])
+              else df[col].to_numpy())[positions]
+        for col in values
+    })
+    grouped = frame.groupby(group_ids, sort=True)
+
+    quantile_grouped = grouped
+    if approx_quantiles and len(frame) > QUANTILE_SAMPLE_ROWS:
+        sample = np.sort(np.random.default_rng(0).choice(len(frame), QUANTILE_SAMPLE_ROWS, replace=False))
+        quantile_grouped = frame.iloc[sample].groupby(group_ids[sample], sort=True)
+
+    for func in funcs:
+        if func in GROUPBY_QUANTILES:
+            agg = quantile_grouped.quantile(GROUPBY_QUANTILES[func])
+        else:
+            agg = grouped.agg(func)
+        agg = agg.reindex(np.arange(len(first)))
+        for col in values:
+            result[f"{func.title()} of {col}"] = agg[col].to_numpy()
+
+    if len(result.columns) > len(keys):
+        result = result.sort_values(by=result.columns[len(keys)], ascending=False)
+    return result.reset_index(drop=True)
+
+def fill_column(series, value):
+    """Fills missing values in one column, widening integer columns when the value needs it.
+
+    ``value`` is a scalar, or a Series of per-row values aligned on the row labels.
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        values = value.dropna().unique() if isinstance(value, pd.Series) else [value]
+        new = [v for v in values if v not in series.cat.categories]
+        if new:
+            series = series.cat.add_categories(new)
+    try:
+        return series.fillna(value)
+    except (TypeError, ValueError):
+        return series.astype('Float64').fillna(value)
+
+def fill_frame(df, fills):
+    """Applies a ``{column: value}`` dict of fills with one dict-based ``fillna``.
+
+    Categorical and integer columns, which may need new categories or a wider dtype, go
+    through ``fill_column``, as does every column when the bulk fill rejects a value;
+    untouched columns are shared with ``df``.
+    """
+    df = df.copy(deep=False)
+    special = [col for col in fills if isinstance(df[col].dtype, pd.CategoricalDtype)
+               or pd.api.types.is_integer_dtype(df[col])]
+    bulk = {col: value for col, value in fills.items() if col not in special}
+    if bulk:
+        try:
+            df[list(bulk)] = df[list(bulk)].fillna(bulk)
+        except (TypeError, ValueError):
+            special = list(fills)
+    for col in special:
+        df[col] = fill_column(df[col], fills[col])
+    return df
+
+def apply_step(df, keep=None, fills=None):
+    """Applies column fill values and a boolean row mask without copying untouched columns."""
+    if fills:
+        df = fill_frame(df, fills)
+    if keep is not None:
+        df = df[keep]
+    return df
+
+IMPUTE_STRATEGIES = {
+    "Drop Rows": "drop_rows",
+    "Fill with Mean (Numerical only)": "mean",
+    "Fill with Median (Numerical only)": "median",
+    "Fill with Mode (All types)": "mode",
+    "Fill with Group Mean (Numerical only)": "group_mean",
+    "Fill with Group Median (Numerical only)": "group_median",
+    "Forward Fill (ordered data)": "ffill",
+    "Backward Fill (ordered data)": "bfill",
+    "K-Nearest Neighbours (Numerical only)": "knn",
+}
+KNN_NEIGHBORS = 5
+KNN_REFERENCE_ROWS = 20_000
+KNN_CHUNK_ROWS = 10_000
+
+def _missing_fills(df, filled):
+    """Per-row fill Series holding only the rows that are missing in ``df`` and got a value."""
+    fills = {}
+    for col in filled.columns:
+        values = filled[col][df[col].isna().to_numpy()].dropna()
+        if len(values):
+            fills[col] = values
+    return fills
+
+def _column_modes(df, cols):
+    """Most frequent value per column (smallest on ties, as ``Series.mode``) in one count each."""
+    modes = {}
+    for col in cols:
+        counts = df[col].value_counts(sort=False)
+        counts = counts[counts > 0]
+        modes[col] = counts[counts == counts.max()].index.sort_values()[0] if len(counts) else "Unknown"
+    return modes
+
+def _knn_fills(df, cols, seed=0):
+    """KNN imputation against a sample of complete rows, searched in chunks of gap rows.
+
+    Every numerical column serves as a standardized feature. Gap rows are grouped by which
+    features they lack, and each group is searched on the features it has; a gap takes the
+    mean of its neighbours' values.
+    """
+    features = [col for col in df.select_dtypes(include='number').columns
+                if not pd.api.types.is_bool_dtype(df[col])]
+    X = df[features].to_numpy(dtype='float64', na_value=np.nan)
+    targets = [features.index(col) for col in cols]
+    gaps = np.flatnonzero(np.isnan(X[:, targets]).any(axis=1))
+    complete = np.flatnonzero(~np.isnan(X).any(axis=1))
+    if not len(gaps) or not len(complete):
+        return {}
+    rng = np.random.default_rng(seed)
+    reference = X[rng.choice(complete, min(len(complete), KNN_REFERENCE_ROWS), replace=False)]
+    center = reference.mean(axis=0)
+    scale = reference.std(axis=0)
+    scale[scale == 0] = 1
+    scaled = (reference - center) / scale
+    values = reference[:, targets]
+    n_neighbors = min(KNN_NEIGHBORS, len(reference))
+
+    imputed = np.empty((len(gaps), len(targets)))
+    patterns, pattern_of = np.unique(np.isnan(X[gaps]), axis=0, return_inverse=True)
+    for pattern, missing in enumerate(patterns):
+        rows = np.flatnonzero(pattern_of.ravel() == pattern)
+        observed = ~missing
+        if not observed.any():
+            imputed[rows] = values.mean(axis=0)
+            continue
+        search = NearestNeighbors(n_neighbors=n_neighbors).fit(scaled[:, observed])
+        for start in range(0, len(rows), KNN_CHUNK_ROWS):
+            chunk = rows[start:start + KNN_CHUNK_ROWS]
+            query = (X[gaps[chunk]][:, observed] - center[observed]) / scale[observed]
+            _, neighbours = search.kneighbors(query)
+            imputed[chunk] = values[neighbours].mean(axis=1)
+    filled = pd.DataFrame(imputed, columns=cols, index=df.index[gaps])
+    return _missing_fills(df.iloc[gaps], filled)
+
+@tr.traced
+def plan_clean_missing(df, strategy, cols, group_col=None, order_col=None):
+    """Works out a missing-value step against ``df`` without modifying it.
+
+    Fill statistics for all columns come from one aggregated pass. Returns ``(keep, fills)``:
+    a boolean row mask (or None) and a ``{column: value}`` dict whose values are scalars,
+    or Series of per-row values for the group-wise, forward/backward and KNN strategies.
+    ``group_col`` is the category for group-wise fills; ``order_col`` orders the rows for
+    forward/backward fill.
+    """
     if not cols:
         st.info("No columns selected for missing value imputation.")
-        return df.copy()
+        return None, {}
 
-    df_cleaned = df.copy()
-    
     if strategy == "drop_rows":
-        before = len(df_cleaned)
-        df_cleaned.dropna(subset=cols, inplace=True)
-        st.success(f"Dropped {before - len(df_cleaned)} rows with missing values in selected columns.")
-    
-    elif strategy in ["mean", "median"]:
-        for col in cols:
-            if pd.api.types.is_numeric_dtype(df_cleaned[col]):
-                fill_value = df_cleaned[col].mean() if strategy == "mean" else df_cleaned[col].median()
-                df_cleaned[col].fillna(fill_value, inplace=True)
-            else:
-                st.warning(f"Skipping **{col}**: {strategy} only applies to numerical columns.")
-        st.success(f"Filled missing values in numerical columns using **{strategy}**.")
-        
-    elif strategy == "mode":
-        for col in cols:
-            fill_value = df_cleaned[col].mode().iloc[0] if not df_cleaned[col].mode().empty else "Unknown"
-            df_cleaned[col].fillna(fill_value, inplace=True)
+        keep = df[cols].notna().all(axis=1).to_numpy()
+        st.success(f"Dropped {int((~keep).sum())} rows with missing values in selected columns.")
+        return keep, {}
+
+    if strategy in ("ffill", "bfill"):
+        frame = df[cols]
+        if order_col:
+            # Rows missing the order key go last, in their original order.
+            frame = frame.iloc[tv.sort_order(df[order_col])[0]]
+        filled = frame.ffill() if strategy == "ffill" else frame.bfill()
+        fills = _missing_fills(df, filled.loc[df.index])
+        st.success(f"Filled missing values using **{'forward' if strategy == 'ffill' else 'backward'} fill**.")
+        return None, fills
+
+    if strategy == "mode":
+        fills = _column_modes(df, cols)
         st.success("Filled missing values in selected columns using **mode**.")
-        
-    return df_cleaned
+        return None, fills
 
-def remove_outliers_iqr(df, cols):
-    """Removes outliers using the Interquartile Range (IQR) method."""
-    if not cols:
-        st.info("No numerical columns selected for outlier removal.")
-        return df.copy()
+    numeric = []
+    for col in cols:
+        if (pd.api.types.is_numeric_dtype(df[col]) and not pd.api.types.is_bool_dtype(df[col])
+                and col != group_col):
+            numeric.append(col)
+        else:
+            st.warning(f"Skipping **{col}**: {strategy.replace('_', ' ')} only applies to numerical columns.")
+    if not numeric:
+        return None, {}
+
+    if strategy in ("mean", "median"):
+        stats = df[numeric].agg(strategy)
+        fills = {col: stats[col] for col in numeric if pd.notna(stats[col])}
+    elif strategy in ("group_mean", "group_median"):
+        how = strategy.split("_")[1]
+        grouped = df.groupby(group_col, observed=True, sort=False)[numeric].transform(how)
+        # Rows in groups with no observed value fall back to the column-wide statistic.
+        fills = _missing_fills(df, grouped.fillna(df[numeric].agg(how)))
+    elif strategy == "knn":
+        fills = _knn_fills(df, numeric)
+        if not fills:
+            st.warning("KNN needs at least one row with no missing numerical values.")
+            return None, {}
+    else:
+        raise ValueError(f"Unknown imputation strategy: {strategy}")
+    st.success(f"Filled missing values in numerical columns using **{strategy.replace('_', ' ')}**.")
+    return None, fills
+
+def clean_missing(df, strategy, cols, group_col=None, order_col=None):
+    """Handles missing values based on the selected strategy."""
+    keep, fills = plan_clean_missing(df, strategy, cols, group_col, order_col)
+    return apply_step(df, keep, fills)
+
+OUTLIER_METHODS = {
+    "IQR": "iqr",
+    "Z-score": "zscore",
+    "MAD (robust z-score)": "mad",
+    "Isolation Forest": "isolation_forest",
+}
+# IQR fence multiplier, z-score cutoffs, or the expected outlier fraction for Isolation Forest.
+OUTLIER_THRESHOLDS = {"iqr": 1.5, "zscore": 3.0, "mad": 3.5, "isolation_forest": 0.01}
+ISOLATION_FIT_ROWS = 100_000
+ISOLATION_CHUNK_ROWS = 1_000_000
+
+def _column_quantiles(X, qs, approx=False):
+    """Quantiles of every column of ``X`` at once; returns ``(values, rank_error)``."""
+    if not approx:
+        return np.nanquantile(X, qs, axis=0), 0.0
+    values, rank_error = np.empty((len(qs), X.shape[1])), 0.0
+    for j in range(X.shape[1]):
+        sketch = sk.QuantileSketch()
+        for start in range(0, len(X), sk.SKETCH_CHUNK_ROWS):
+            sketch.update(X[start:start + sk.SKETCH_CHUNK_ROWS, j])
+        values[:, j] = sketch.quantile(qs)
+        rank_error = max(rank_error, sketch.rank_error)
+    return values, rank_error
+
+def _isolation_flags(X, contamination, seed=0):
+    """Isolation Forest fit on a row sample, then scored chunk by chunk; NaNs become medians."""
+    medians = np.nan_to_num(np.nanmedian(X, axis=0))
+    rng = np.random.default_rng(seed)
+    fit_rows = X if len(X) <= ISOLATION_FIT_ROWS else X[rng.choice(len(X), ISOLATION_FIT_ROWS, replace=False)]
+    forest = IsolationForest(contamination=contamination, random_state=seed, n_jobs=-1)
+    forest.fit(np.where(np.isnan(fit_rows), medians, fit_rows))
+    flags = np.empty(len(X), dtype=bool)
+    for start in range(0, len(X), ISOLATION_CHUNK_ROWS):
+        chunk = X[start:start + ISOLATION_CHUNK_ROWS]
+        flags[start:start + len(chunk)] = forest.predict(np.where(np.isnan(chunk), medians, chunk)) == -1
+    return flags
+
+def outlier_flags(df, cols, method="iqr", threshold=None, approx=False):
+    """Flags outliers in the numerical ``cols`` with one vectorized pass.
+
+    Returns ``(flags, bounds, rank_error)``: a boolean frame with one column per input
+    column (a single "Isolation Forest" column for that multivariate method), the
+    per-column lower and upper limits (None for Isolation Forest), and the quantile rank
+    error when ``approx`` sketches the IQR and MAD quantiles. Missing values are never
+    flagged.
+    """
+    threshold = OUTLIER_THRESHOLDS[method] if threshold is None else threshold
+    X = df[cols].to_numpy(dtype='float64', na_value=np.nan)
+    rank_error = 0.0
+
+    if method == "isolation_forest":
+        flags = _isolation_flags(X, threshold)
+        return pd.DataFrame({"Isolation Forest": flags}, index=df.index), None, rank_error
+
+    if method == "iqr":
+        (q1, q3), rank_error = _column_quantiles(X, [0.25, 0.75], approx)
+        lower, upper = q1 - threshold * (q3 - q1), q3 + threshold * (q3 - q1)
+    elif method == "zscore":
+        mean, std = np.nanmean(X, axis=0), np.nanstd(X, axis=0, ddof=1)
+        lower, upper = mean - threshold * std, mean + threshold * std
+    elif method == "mad":
+        (median,), rank_error = _column_quantiles(X, [0.5], approx)
+        (mad,), mad_error = _column_quantiles(np.abs(X - median), [0.5], approx)
+        rank_error = max(rank_error, mad_error)
+        # 0.6745 makes the MAD a consistent estimate of the standard deviation for normal data.
+        lower, upper = median - threshold * mad / 0.6745, median + threshold * mad / 0.6745
+    else:
+        raise ValueError(f"Unknown outlier method: {method}")
 
-    df_cleaned = df.copy()
-    initial_len = len(df_cleaned)
-    
+    with np.errstate(invalid='ignore'):
+        flags = (X < lower) | (X > upper)
+    bounds = pd.DataFrame({'Lower': lower, 'Upper': upper}, index=pd.Index(cols, name='Column'))
+    return pd.DataFrame(flags, columns=cols, index=df.index), bounds, rank_error
+
+def outlier_preview(flags, bounds=None):
+    """Flagged-row counts per column, plus the limits used, before anything is dropped."""
+    counts = flags.sum()
+    preview = pd.DataFrame({
+        'Flagged Rows': counts,
+        '% Flagged': (counts / max(len(flags), 1) * 100).round(2),
+    })
+    preview.index.name = 'Column'
+    if bounds is not None:
+        preview = preview.join(bounds)
+    return preview
+
+def outlier_mask(df, cols, method="iqr", threshold=None, approx=False):
+    """Reduces ``outlier_flags`` to what a removal step needs.
+
+    Returns ``(keep, preview, rank_error)``: the boolean mask of rows no column flags, the
+    ``outlier_preview`` table and the quantile rank error. The per-column flags are
+    dropped, so only the mask grows with the data.
+    """
+    flags, bounds, rank_error = outlier_flags(df, cols, method, threshold, approx)
+    keep = ~flags.to_numpy().any(axis=1)
+    # Shared by every session through the cache below.
+    keep.flags.writeable = False
+    return keep, outlier_preview(flags, bounds), rank_error
+
+@st.cache_resource(max_entries=8, show_spinner=False)
+def _cached_outlier_mask(_df, version, cols, method, threshold, approx):
+    return outlier_mask(_df, list(cols), method, threshold, approx)
+
+def get_outlier_mask(df, cols, method="iqr", threshold=None, approx=False, version=None):
+    """``outlier_mask`` shared between the preview and the removal step per dataset version."""
+    if version is None:
+        return outlier_mask(df, cols, method, threshold, approx)
+    return _cached_outlier_mask(df, version, tuple(cols), method, threshold, approx)
+
+def _numeric_outlier_cols(df, cols, method_label):
+    numeric = []
     for col in cols:
-        if pd.api.types.is_numeric_dtype(df_cleaned[col]):
-            Q1 = df_cleaned[col].quantile(0.25)
-            Q3 = df_cleaned[col].quantile(0.75)
-            IQR = Q3 - Q1
-            lower = Q1 - 1.5 * IQR
-            upper = Q3 + 1.5 * IQR
-            
-            df_cleaned = df_cleaned[(df_cleaned[col] >= lower) & (df_cleaned[col] <= upper)]
+        if pd.api.types.is_numeric_dtype(df[col]) and not pd.api.types.is_bool_dtype(df[col]):
+            numeric.append(col)
         else:
-            st.warning(f"Skipping **{col}**: IQR method only applies to numerical columns.")
+            st.warning(f"Skipping **{col}**: {method_label} only applies to numerical columns.")
+    return numeric
 
-    removed_rows = initial_len - len(df_cleaned)
+@tr.traced
+def plan_remove_outliers(df, cols, method="iqr", threshold=None, approx=False, version=None):
+    """Works out which rows survive outlier removal; returns a boolean row mask or None.
+
+    A row is dropped when any selected column flags it. Limits are computed on the full
+    data for every column, independently of the other columns.
+    """
+    label = next(name for name, key in OUTLIER_METHODS.items() if key == method)
+    cols = _numeric_outlier_cols(df, cols or [], label)
+    if not cols:
+        st.info("No numerical columns selected for outlier removal.")
+        return None
+
+    keep, _, rank_error = get_outlier_mask(df, cols, method, threshold, approx, version)
+
+    removed_rows = int((~keep).sum())
     if removed_rows > 0:
         st.success(f"Removed **{removed_rows}** outlier rows across selected numerical columns.")
     else:
-        st.info("No outliers removed based on the IQR method for the selected columns.")
+        st.info(f"No outliers removed based on the {label} method for the selected columns.")
+    if rank_error:
+        st.caption(f"Quantiles are approximate: within ±{rank_error:.3%} in rank (95%).")
         
-    return df_cleaned
\ No newline at end of file
+    return keep
+
+def plan_remove_outliers_iqr(df, cols, approx=False):
+    """Works out which rows survive IQR outlier removal; returns a boolean row mask or None."""
+    return plan_remove_outliers(df, cols, "iqr", approx=approx)
+
+def remove_outliers_iqr(df, cols, approx=False):
+    """Removes outliers using the Interquartile Range (IQR) method."""
+    return apply_step(df, plan_remove_outliers_iqr(df, cols, approx))
+
+def format_bytes(size):
+    """Formats a byte count with a binary unit."""
+    for unit in ["B", "KB", "MB", "GB", "TB"]:
+        if abs(size) < 1024:
+            return f"{size:.2f} {unit}"
+        size /= 1024
+    return f"{size:.2f} TB"
\ No newline at end of file
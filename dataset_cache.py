@@ -0,0 +1,123 @@
+"""Persistent, content-addressed cache of parsed datasets stored as Feather files."""
+import hashlib
+import os
+import uuid
+
+import pyarrow as pa
+import pyarrow.feather as feather
+
+try:
+    import xxhash
+except ImportError:  # falls back to hashing sampled blocks of large files
+    xxhash = None
+
+CACHE_DIR = os.environ.get(
+    "DATAVIZ_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "data-viz")
+)
+CACHE_BUDGET_BYTES = int(os.environ.get("DATAVIZ_CACHE_BUDGET_MB", "4096")) << 20
+HASH_CHUNK_BYTES = 8 << 20
+# Without xxhash, files larger than this are keyed by their size and sampled blocks.
+HASH_FULL_MAX_BYTES = 32 << 20
+HASH_SAMPLE_BLOCKS = 32
+HASH_SAMPLE_BYTES = 1 << 20
+# Bump when parsing changes so stale entries are never served.
+LOADER_VERSION = "5"
+
+
+def _sampled_hash(file_obj, size):
+    """BLAKE2b of the size and ``HASH_SAMPLE_BLOCKS`` evenly spaced blocks, ends included."""
+    digest = hashlib.blake2b(str(size).encode(), digest_size=16)
+    step = (size - HASH_SAMPLE_BYTES) / (HASH_SAMPLE_BLOCKS - 1)
+    for i in range(HASH_SAMPLE_BLOCKS):
+        file_obj.seek(round(i * step))
+        digest.update(file_obj.read(HASH_SAMPLE_BYTES))
+    return digest.hexdigest()
+
+
+def content_hash(file_obj):
+    """Hashes the file contents.
+
+    With xxhash installed the whole file is hashed with XXH3-128, which runs near memory
+    bandwidth. Otherwise small files are hashed whole with BLAKE2b and larger ones by
+    sampling: an edit that keeps the file size and misses every sampled block would then
+    be served the cached parse of the old contents.
+    """
+    size = file_obj.seek(0, os.SEEK_END)
+    file_obj.seek(0)
+    if xxhash is None and size > HASH_FULL_MAX_BYTES:
+        key = _sampled_hash(file_obj, size)
+    else:
+        digest = xxhash.xxh3_128() if xxhash is not None else hashlib.blake2b(digest_size=16)
+        while chunk := file_obj.read(HASH_CHUNK_BYTES):
+            digest.update(chunk)
+        key = digest.hexdigest()
+    file_obj.seek(0)
+    return key
+
+
+def cache_key(file_obj, **options):
+    """Builds a key from the file contents, its extension and any loader options."""
+    ext = os.path.splitext(getattr(file_obj, "name", ""))[1].lower()
+    opts = ",".join(f"{k}={options[k]!r}" for k in sorted(options))
+    suffix = hashlib.blake2b(f"{LOADER_VERSION}|{ext}|{opts}".encode(), digest_size=4).hexdigest()
+    return f"{content_hash(file_obj)}-{suffix}"
+
+
+def _path(key):
+    return os.path.join(CACHE_DIR, f"{key}.feather")
+
+
+def get(key):
+    """Returns the cached frame for ``key`` or None, marking the entry as recently used."""
+    path = _path(key)
+    if not os.path.exists(path):
+        return None
+    try:
+        table = feather.read_table(path, memory_map=True)
+        os.utime(path)
+    except (pa.ArrowException, OSError):
+        return None
+    return table.to_pandas()
+
+
+def put(key, df):
+    """Stores ``df`` under ``key`` and evicts old entries; returns False if it can't be cached."""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp_path = os.path.join(CACHE_DIR, f".{uuid.uuid4().hex}.tmp")
+    try:
+        feather.write_feather(df, tmp_path, compression="lz4")
+        os.replace(tmp_path, _path(key))
+    except (pa.ArrowException, OSError, ValueError, TypeError):
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return False
+    evict()
+    return True
+
+
+def entries():
+    """Lists cached entries as (path, size, last_used), least recently used first."""
+    if not os.path.isdir(CACHE_DIR):
+        return []
+    found = []
+    for name in os.listdir(CACHE_DIR):
+        if name.endswith(".feather"):
+            path = os.path.join(CACHE_DIR, name)
+            stat = os.stat(path)
+            found.append((path, stat.st_size, stat.st_mtime))
+    return sorted(found, key=lambda entry: entry[2])
+
+
+def evict(budget=None):
+    """Deletes least recently used entries until the cache fits in its size budget."""
+    budget = CACHE_BUDGET_BYTES if budget is None else budget
+    cached = entries()
+    total = sum(size for _, size, _ in cached)
+    for path, size, _ in cached:
+        if total <= budget:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
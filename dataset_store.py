@@ -0,0 +1,119 @@
+"""Process-wide store of loaded datasets, shared by every session that opens the same file.
+
+Frames are keyed by content hash and treated as immutable: sessions clean data through
+``lineage.Lineage``, which copies only the columns a step fills. The store pins recently
+used frames up to a memory budget; once unpinned, a frame stays resident only while some
+session still holds it, and can be reloaded from the on-disk ``dataset_cache``.
+"""
+import os
+import threading
+import time
+import weakref
+from collections import OrderedDict
+
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+STORE_BUDGET_BYTES = int(os.environ.get("DATAVIZ_STORE_BUDGET_MB", "2048")) << 20
+
+
+class _Entry:
+    __slots__ = ("ref", "name", "n_bytes", "shape", "loaded", "last_used", "sessions")
+
+    def __init__(self, frame, name):
+        self.ref = weakref.ref(frame)
+        self.name = name
+        self.n_bytes = int(frame.memory_usage(deep=True).sum())
+        self.shape = frame.shape
+        self.loaded = self.last_used = time.time()
+        self.sessions = set()
+
+
+_entries = {}
+_pinned = OrderedDict()
+_lock = threading.Lock()
+_loading = {}
+
+
+def _session_id():
+    ctx = get_script_run_ctx(suppress_warning=True)
+    return ctx.session_id if ctx else "bare"
+
+
+def _evict(budget):
+    total = sum(_entries[key].n_bytes for key in _pinned)
+    while _pinned and total > budget:
+        key, _ = _pinned.popitem(last=False)
+        total -= _entries[key].n_bytes
+
+
+def _prune():
+    for key in [key for key, entry in _entries.items() if entry.ref() is None]:
+        del _entries[key]
+
+
+def get_or_load(key, loader, name=None):
+    """Returns the shared frame for ``key``, calling ``loader()`` only if no session holds it.
+
+    Concurrent requests for the same key wait for a single load instead of parsing twice.
+    """
+    session = _session_id()
+    with _lock:
+        entry = _entries.get(key)
+        frame = entry.ref() if entry else None
+        if frame is None:
+            event = _loading.get(key)
+            owner = event is None
+            if owner:
+                event = _loading[key] = threading.Event()
+    if frame is None:
+        if not owner:
+            event.wait()
+            return get_or_load(key, loader, name)
+        try:
+            frame = loader()
+        finally:
+            with _lock:
+                _loading.pop(key).set()
+        if frame is None:
+            return None
+        with _lock:
+            _prune()
+            entry = _entries[key] = _Entry(frame, name)
+
+    with _lock:
+        entry.last_used = time.time()
+        # A session works on one dataset at a time, so it leaves the one it had before.
+        for other in _entries.values():
+            other.sessions.discard(session)
+        entry.sessions.add(session)
+        _pinned[key] = frame
+        _pinned.move_to_end(key)
+        _evict(STORE_BUDGET_BYTES)
+    return frame
+
+
+def evict_idle():
+    """Unpins every frame, leaving resident only those a session still holds."""
+    with _lock:
+        _pinned.clear()
+        _prune()
+
+
+def stats():
+    """One row per resident dataset: name, shape, bytes, pinned, sessions and timestamps.
+
+    ``sessions`` counts the sessions whose latest dataset this is.
+    """
+    with _lock:
+        _prune()
+        return [{
+            "key": key,
+            "name": entry.name,
+            "rows": entry.shape[0],
+            "columns": entry.shape[1],
+            "bytes": entry.n_bytes,
+            "pinned": key in _pinned,
+            "sessions": len(entry.sessions),
+            "loaded": entry.loaded,
+            "last_used": entry.last_used,
+        } for key, entry in _entries.items()]
@@ -0,0 +1,252 @@
+"""Excel ingestion: sheet listing without parsing, fast row reading and range selection.
+
+Sheets are read with the Rust-based calamine engine when python-calamine is installed.
+Without it, ``.xlsx`` workbooks are streamed with openpyxl in read-only, values-only mode,
+so no cell objects are built, and legacy ``.xls`` workbooks go through xlrd. Several
+sheets are parsed in parallel worker processes and stacked with a ``Sheet`` column.
+"""
+import io
+import multiprocessing
+import os
+import posixpath
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from xml.etree import ElementTree
+
+import pandas as pd
+from openpyxl import load_workbook
+
+try:
+    import python_calamine
+except ImportError:  # falls back to openpyxl and xlrd
+    python_calamine = None
+
+try:
+    import xlrd
+except ImportError:  # legacy .xls uploads need xlrd without calamine
+    xlrd = None
+
+EXCEL_EXTENSIONS = ('.xlsx', '.xlsm', '.xls')
+EXCEL_MAX_WORKERS = min(4, os.cpu_count() or 1)
+# Below this size, starting worker processes costs more than parsing the sheets in turn.
+EXCEL_PARALLEL_MIN_BYTES = 32 << 20
+PROGRESS_ROWS = 50_000
+PREVIEW_ROWS = 5
+
+_MAIN_NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_REL_NS = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+_PKG_REL_NS = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+
+
+def is_excel(name):
+    return name.lower().endswith(EXCEL_EXTENSIONS)
+
+
+def is_legacy(name):
+    return name.lower().endswith('.xls')
+
+
+def _engine(legacy):
+    """pandas engine for a workbook, or None to stream it with openpyxl."""
+    if python_calamine is not None:
+        return "calamine"
+    if legacy:
+        if xlrd is None:
+            raise ImportError("Reading legacy .xls files needs python-calamine or xlrd.")
+        return "xlrd"
+    return None
+
+
+def _data(file_obj):
+    if hasattr(file_obj, "getvalue"):
+        return file_obj.getvalue()
+    file_obj.seek(0)
+    return file_obj.read()
+
+
+def _rows_from_dimension(ref):
+    """Row count of a sheet ``<dimension ref="A1:K300001">``, or None if it isn't recorded."""
+    last = ref.split(":")[-1].lstrip("ABCDEFGHIJKLMNOPQRSTUVWXYZ$")
+    return int(last) if last.isdigit() else None
+
+
+def list_sheets(file_obj):
+    """Sheet names and recorded row counts, read from the workbook index without parsing cells.
+
+    Returns a list of ``{"name", "rows"}`` dicts; ``rows`` is None when the file doesn't
+    record it (always for ``.xls``).
+    """
+    data = _data(file_obj)
+    if is_legacy(file_obj.name):
+        if _engine(True) == "calamine":
+            names = python_calamine.CalamineWorkbook.from_filelike(io.BytesIO(data)).sheet_names
+        else:
+            book = xlrd.open_workbook(file_contents=data, on_demand=True)
+            names = book.sheet_names()
+            book.release_resources()
+        return [{"name": name, "rows": None} for name in names]
+
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        workbook = ElementTree.fromstring(archive.read("xl/workbook.xml"))
+        rels = ElementTree.fromstring(archive.read("xl/_rels/workbook.xml.rels"))
+        targets = {rel.get("Id"): rel.get("Target") for rel in rels.iter(f"{_PKG_REL_NS}Relationship")}
+        sheets = []
+        for sheet in workbook.iter(f"{_MAIN_NS}sheet"):
+            target = targets.get(sheet.get(f"{_REL_NS}id"), "")
+            path = target.lstrip("/") if target.startswith("/") else posixpath.normpath(posixpath.join("xl", target))
+            rows = None
+            if path in archive.namelist():
+                # The dimension element precedes the cell data, so only the head is parsed.
+                with archive.open(path) as source:
+                    for _, element in ElementTree.iterparse(source, events=("start",)):
+                        if element.tag == f"{_MAIN_NS}dimension":
+                            rows = _rows_from_dimension(element.get("ref", ""))
+                            break
+                        if element.tag == f"{_MAIN_NS}sheetData":
+                            break
+            sheets.append({"name": sheet.get("name"), "rows": rows})
+    return sheets
+
+
+def _column_names(values):
+    """Header labels as pandas names them: blanks become ``Unnamed: i``, repeats get ``.1``."""
+    names = []
+    seen = {}
+    for i, value in enumerate(values):
+        name = f"Unnamed: {i}" if value is None or str(value).strip() == "" else str(value)
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+
+def sheet_columns(file_obj, sheet, header_row=1):
+    """Column names in ``header_row`` (1-based) of ``sheet``."""
+    data = _data(file_obj)
+    engine = _engine(is_legacy(file_obj.name))
+    if engine is not None:
+        return list(pd.read_excel(io.BytesIO(data), engine=engine, sheet_name=sheet,
+                                  header=header_row - 1, nrows=0).columns.astype(str))
+    # Read-only mode stops parsing the sheet right after the header row.
+    workbook = load_workbook(io.BytesIO(data), read_only=True, data_only=True, keep_links=False)
+    try:
+        header = next(workbook[sheet].iter_rows(min_row=header_row, max_row=header_row,
+                                                values_only=True), ())
+    finally:
+        workbook.close()
+    return _column_names(header)
+
+
+def _select(rows, header, positions, min_col, max_col):
+    df = pd.DataFrame.from_records(rows, columns=header[min_col - 1:max_col], coerce_float=True)
+    return df.iloc[:, [position - min_col + 1 for position in positions]]
+
+
+def _read_xlsx(data, sheet, columns, header_row, first_row, last_row, on_progress):
+    workbook = load_workbook(io.BytesIO(data), read_only=True, data_only=True, keep_links=False)
+    try:
+        worksheet = workbook[sheet]
+        header = _column_names(next(worksheet.iter_rows(min_row=header_row, max_row=header_row,
+                                                        values_only=True), ()))
+        positions = list(range(len(header))) if columns is None else [
+            header.index(col) for col in columns if col in header]
+        if not positions:
+            return pd.DataFrame()
+        # Only the spanned columns are materialized for each streamed row.
+        min_col, max_col = min(positions) + 1, max(positions) + 1
+        last = last_row or worksheet.max_row
+        expected = last - first_row + 1 if last else None
+
+        rows = []
+        for row in worksheet.iter_rows(min_row=first_row, max_row=last_row, min_col=min_col,
+                                       max_col=max_col, values_only=True):
+            rows.append(row)
+            if on_progress is not None and len(rows) % PROGRESS_ROWS == 0:
+                preview = None
+                if len(rows) == PROGRESS_ROWS:
+                    preview = _select(rows[:PREVIEW_ROWS], header, positions, min_col, max_col)
+                on_progress(min(len(rows) / expected, 1.0) if expected else 0.0, preview)
+    finally:
+        workbook.close()
+
+    df = _select(rows, header, positions, min_col, max_col)
+    # Like read_excel, skip blank rows (including formatted but empty trailing ones).
+    return df.dropna(how='all').reset_index(drop=True)
+
+
+def _read_with_pandas(data, engine, sheet, columns, header_row, first_row, last_row):
+    wanted = None if columns is None else set(columns)
+    return pd.read_excel(
+        io.BytesIO(data), engine=engine, sheet_name=sheet, header=header_row - 1,
+        skiprows=range(header_row, first_row - 1),
+        nrows=None if last_row is None else last_row - first_row + 1,
+        usecols=None if wanted is None else (lambda name: str(name) in wanted),
+    )
+
+
+def read_sheet(data, legacy, sheet, columns=None, header_row=1, first_row=None, last_row=None,
+               on_progress=None):
+    """Reads one sheet from workbook bytes.
+
+    ``header_row``, ``first_row`` and ``last_row`` are 1-based sheet row numbers; data
+    starts right below the header by default and runs to the end. ``columns`` picks
+    header names to keep (missing ones are ignored).
+    """
+    first_row = first_row or header_row + 1
+    engine = _engine(legacy)
+    if engine is not None:
+        return _read_with_pandas(data, engine, sheet, columns, header_row, first_row, last_row)
+    return _read_xlsx(data, sheet, columns, header_row, first_row, last_row, on_progress)
+
+
+def _pool_context():
+    # Forking a threaded server process is unsafe; workers only need this module.
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+
+def _sheet_column(columns):
+    """``Sheet``, or ``Sheet.1``, ``Sheet.2``... when the sheets already have that column."""
+    label, i = "Sheet", 0
+    while label in columns:
+        i += 1
+        label = f"Sheet.{i}"
+    return label
+
+
+def read_workbook(file_obj, sheets=None, columns=None, header_row=1, first_row=None,
+                  last_row=None, on_progress=None):
+    """Reads the selected sheets of an uploaded workbook into one frame.
+
+    A single sheet is streamed in this process with progress reports; several sheets of a
+    large workbook are parsed in parallel processes. Sheets are stacked with a leading
+    ``Sheet`` column (``Sheet.1`` and so on if the sheets already have one).
+    ``on_progress(fraction, preview)`` follows ``read_csv_streaming``.
+    """
+    data = _data(file_obj)
+    legacy = is_legacy(file_obj.name)
+    sheets = list(sheets or [list_sheets(file_obj)[0]["name"]])
+    options = (columns, header_row, first_row, last_row)
+    if len(sheets) == 1:
+        return read_sheet(data, legacy, sheets[0], *options, on_progress=on_progress)
+
+    frames = {}
+    if len(data) < EXCEL_PARALLEL_MIN_BYTES or EXCEL_MAX_WORKERS == 1:
+        for done, sheet in enumerate(sheets, 1):
+            frames[sheet] = read_sheet(data, legacy, sheet, *options)
+            if on_progress is not None:
+                on_progress(done / len(sheets), None)
+    else:
+        workers = min(len(sheets), EXCEL_MAX_WORKERS)
+        with ProcessPoolExecutor(max_workers=workers, mp_context=_pool_context()) as pool:
+            futures = {pool.submit(read_sheet, data, legacy, sheet, *options): sheet for sheet in sheets}
+            for done, future in enumerate(as_completed(futures), 1):
+                frames[futures[future]] = future.result()
+                if on_progress is not None:
+                    on_progress(done / len(sheets), None)
+    label = _sheet_column({str(col) for frame in frames.values() for col in frame.columns})
+    df = pd.concat([frames[sheet] for sheet in sheets], keys=sheets, names=[label, None])
+    return df.reset_index(level=label).reset_index(drop=True)
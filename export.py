@@ -0,0 +1,125 @@
+"""On-demand, chunked export of the current dataset, cached on disk per dataset version."""
+import os
+import uuid
+
+import openpyxl
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import dataset_cache
+
+EXPORT_DIR = os.path.join(dataset_cache.CACHE_DIR, "exports")
+EXPORT_CHUNK_ROWS = 100_000
+EXPORT_MAX_FILES = 20
+EXCEL_MAX_ROWS = 1_048_575
+# Download buttons send the whole file through server memory; larger files stay on disk.
+DOWNLOAD_MAX_BYTES = int(os.environ.get("DATAVIZ_DOWNLOAD_MAX_MB", "512")) << 20
+
+# Label -> (file extension, MIME type)
+EXPORT_FORMATS = {
+    "CSV": ("csv", "text/csv"),
+    "CSV (gzip)": ("csv.gz", "application/gzip"),
+    "CSV (zstd)": ("csv.zst", "application/zstd"),
+    "Excel (.xlsx)": ("xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "Parquet": ("parquet", "application/vnd.apache.parquet"),
+    "Feather": ("feather", "application/vnd.apache.arrow.file"),
+}
+
+
+def _chunks(df):
+    for start in range(0, len(df), EXPORT_CHUNK_ROWS):
+        yield start, df.iloc[start:start + EXPORT_CHUNK_ROWS]
+
+
+def _write_csv(df, path, compression=None):
+    sink = pa.CompressedOutputStream(path, compression) if compression else pa.OSFile(path, "wb")
+    with sink:
+        if df.empty:
+            sink.write(df.to_csv(index=False).encode("utf-8"))
+        for start, chunk in _chunks(df):
+            sink.write(chunk.to_csv(index=False, header=start == 0).encode("utf-8"))
+
+
+def _write_excel(df, path):
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append([str(col) for col in df.columns])
+    for _, chunk in _chunks(df):
+        rows = chunk.astype(object).where(chunk.notna(), None)
+        for row in rows.itertuples(index=False, name=None):
+            sheet.append(row)
+    workbook.save(path)
+
+
+def _write_arrow(df, path, parquet):
+    schema = pa.Schema.from_pandas(df.iloc[:EXPORT_CHUNK_ROWS], preserve_index=False)
+    if parquet:
+        writer = pq.ParquetWriter(path, schema, compression="zstd")
+    else:
+        writer = pa.ipc.new_file(path, schema, options=pa.ipc.IpcWriteOptions(compression="lz4"))
+    with writer:
+        for _, chunk in _chunks(df):
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+
+
+def _write(df, fmt, path):
+    if fmt == "CSV":
+        _write_csv(df, path)
+    elif fmt == "CSV (gzip)":
+        _write_csv(df, path, "gzip")
+    elif fmt == "CSV (zstd)":
+        _write_csv(df, path, "zstd")
+    elif fmt == "Excel (.xlsx)":
+        if len(df) > EXCEL_MAX_ROWS:
+            raise ValueError(f"Excel sheets hold at most {EXCEL_MAX_ROWS:,} data rows.")
+        _write_excel(df, path)
+    elif fmt in ("Parquet", "Feather"):
+        _write_arrow(df, path, parquet=fmt == "Parquet")
+    else:
+        raise ValueError(f"Unknown export format: {fmt}")
+
+
+def _evict():
+    files = [os.path.join(EXPORT_DIR, name) for name in os.listdir(EXPORT_DIR)
+             if not name.startswith(".")]
+    files.sort(key=os.path.getmtime)
+    for path in files[:-EXPORT_MAX_FILES]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def export_path(df, fmt, version=None):
+    """Writes ``df`` in ``fmt`` chunk by chunk, reusing the file already built for ``version``."""
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    ext, _ = EXPORT_FORMATS[fmt]
+    path = os.path.join(EXPORT_DIR, f"{version or uuid.uuid4().hex}.{ext}")
+    if os.path.exists(path):
+        os.utime(path)
+        return path
+
+    tmp_path = os.path.join(EXPORT_DIR, f".{uuid.uuid4().hex}.tmp")
+    try:
+        _write(df, fmt, tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    _evict()
+    return path
+
+
+def file_bytes(path):
+    """Contents of a file on disk, for a deferred download button."""
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def export_bytes(df, fmt, version=None):
+    """Contents of the exported file, for a deferred download button."""
+    path = export_path(df, fmt, version)
+    data = file_bytes(path)
+    if version is None:
+        os.remove(path)
+    return data
@@ -0,0 +1,80 @@
+"""Process-wide cache of rendered figures as serialized Plotly JSON.
+
+Keys start with the dataset version token, so a cleaning step, which creates a new
+version, never serves a stale figure. Entries are evicted least recently used first to
+stay within a memory budget, and dropped outright once their version can no longer be
+shown.
+"""
+import os
+import threading
+from collections import OrderedDict
+
+FIGURE_CACHE_BUDGET_BYTES = int(os.environ.get("DATAVIZ_FIGURE_CACHE_MB", "256")) << 20
+
+
+class _Entry:
+    __slots__ = ("figures", "notes", "n_bytes")
+
+    def __init__(self, figures, notes):
+        self.figures = figures
+        self.notes = notes
+        self.n_bytes = sum(len(spec) for spec in figures) + sum(len(note) for note in notes)
+
+
+_entries = OrderedDict()
+_lock = threading.Lock()
+_totals = {"bytes": 0, "hits": 0, "misses": 0}
+
+
+def _drop(key):
+    _totals["bytes"] -= _entries.pop(key).n_bytes
+
+
+def get(key):
+    """Returns ``(figures, notes)`` cached under ``key``, or None."""
+    with _lock:
+        entry = _entries.get(key)
+        if entry is None:
+            _totals["misses"] += 1
+            return None
+        _entries.move_to_end(key)
+        _totals["hits"] += 1
+        return entry.figures, entry.notes
+
+
+def put(key, figures, notes=()):
+    """Caches the figure JSON strings and captions one plot call rendered.
+
+    Entries larger than the whole budget are not cached.
+    """
+    entry = _Entry(tuple(figures), tuple(notes))
+    if entry.n_bytes > FIGURE_CACHE_BUDGET_BYTES:
+        return
+    with _lock:
+        if key in _entries:
+            _drop(key)
+        _entries[key] = entry
+        _totals["bytes"] += entry.n_bytes
+        while _totals["bytes"] > FIGURE_CACHE_BUDGET_BYTES:
+            _drop(next(iter(_entries)))
+
+
+def invalidate(versions):
+    """Drops every figure of the given dataset versions."""
+    versions = set(versions)
+    with _lock:
+        for key in [key for key in _entries if key[0] in versions]:
+            _drop(key)
+
+
+def clear():
+    with _lock:
+        _entries.clear()
+        _totals.update(bytes=0, hits=0, misses=0)
+
+
+def stats():
+    """Entry count, bytes held, the budget, and hits and misses since the last clear."""
+    with _lock:
+        return {"entries": len(_entries), "bytes": _totals["bytes"],
+                "budget": FIGURE_CACHE_BUDGET_BYTES, "hits": _totals["hits"], "misses": _totals["misses"]}
@@ -0,0 +1,164 @@
+"""Lightweight timing of hot paths, grouped by session and page, exportable as a trace file."""
+import functools
+import json
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+TRACE_ENABLED = os.environ.get("DATAVIZ_TRACE", "1") != "0"
+# Measuring figure payloads costs one extra JSON serialization per chart, so it is opt-in.
+TRACE_PAYLOAD = os.environ.get("DATAVIZ_TRACE_PAYLOAD", "0") != "0"
+TRACE_MAX_EVENTS = 5_000
+TRACE_MAX_SESSIONS = 50
+
+_sessions = OrderedDict()
+_lock = threading.Lock()
+_local = threading.local()
+
+
+def _session_id():
+    ctx = get_script_run_ctx(suppress_warning=True)
+    return ctx.session_id if ctx else "bare"
+
+
+def _page():
+    try:
+        path = urlparse(st.context.url or "").path.strip("/")
+    except Exception:
+        return "unknown"
+    return path.rsplit("/", 1)[-1] or "Home"
+
+
+def max_rss():
+    """Peak resident memory of the server process in bytes, where the platform reports it."""
+    if resource is None:
+        return None
+    # ru_maxrss is in kilobytes on Linux.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss << 10
+
+
+def current_rss():
+    """Resident memory of the server process right now in bytes, where /proc reports it."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _rows(obj):
+    shape = getattr(obj, "shape", None)
+    return int(shape[0]) if shape else None
+
+
+def _record(event):
+    with _lock:
+        events = _sessions.get(event["session"])
+        if events is None:
+            events = _sessions[event["session"]] = deque(maxlen=TRACE_MAX_EVENTS)
+            while len(_sessions) > TRACE_MAX_SESSIONS:
+                _sessions.popitem(last=False)
+        else:
+            _sessions.move_to_end(event["session"])
+        events.append(event)
+
+
+@contextmanager
+def span(name, rows=None):
+    """Times the enclosed block; callers may add ``rows`` or ``payload_bytes`` to the event.
+
+    ``rss_delta`` is how much the process's resident memory changed over the block, so
+    work done by other threads meanwhile is counted too.
+    """
+    if not TRACE_ENABLED:
+        yield {}
+        return
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    if stack:
+        session, page = stack[0]["session"], stack[0]["page"]
+    else:
+        session, page = _session_id(), _page()
+    event = {
+        "name": name, "session": session, "page": page, "depth": len(stack),
+        "thread": threading.get_ident(), "start": time.time(), "rows": rows, "payload_bytes": None,
+    }
+    stack.append(event)
+    rss = current_rss()
+    started = time.perf_counter()
+    try:
+        yield event
+    finally:
+        event["seconds"] = time.perf_counter() - started
+        end_rss = current_rss() if rss is not None else None
+        event["rss_delta"] = None if end_rss is None else end_rss - rss
+        stack.pop()
+        if stack and event["payload_bytes"]:
+            parent = stack[-1]
+            parent["payload_bytes"] = (parent["payload_bytes"] or 0) + event["payload_bytes"]
+        _record(event)
+
+
+def traced(func):
+    """Decorator recording each call's duration and the rows of its input (or output) frame."""
+    name = f"{func.__module__}.{func.__name__}"
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not TRACE_ENABLED:
+            return func(*args, **kwargs)
+        with span(name, _rows(args[0]) if args else None) as event:
+            result = func(*args, **kwargs)
+            if event["rows"] is None:
+                event["rows"] = _rows(result)
+            return result
+    return wrapper
+
+
+def events(session=None):
+    """Recorded events, newest last, for one session or for all of them."""
+    with _lock:
+        if session is not None:
+            return list(_sessions.get(session, ()))
+        return [event for recorded in _sessions.values() for event in recorded]
+
+
+def current_session():
+    return _session_id()
+
+
+def clear(session=None):
+    with _lock:
+        if session is None:
+            _sessions.clear()
+        else:
+            _sessions.pop(session, None)
+
+
+def chrome_trace(recorded):
+    """Serializes events in the Chrome trace format, readable by Perfetto and chrome://tracing."""
+    sessions = {}
+    trace_events = []
+    for event in recorded:
+        pid = sessions.setdefault(event["session"], len(sessions) + 1)
+        trace_events.append({
+            "name": event["name"], "cat": event["page"], "ph": "X", "pid": pid,
+            "tid": event["thread"], "ts": event["start"] * 1e6, "dur": event["seconds"] * 1e6,
+            "args": {key: event[key] for key in ("rows", "payload_bytes", "rss_delta", "page")},
+        })
+    for session, pid in sessions.items():
+        trace_events.append({"name": "process_name", "ph": "M", "pid": pid,
+                             "args": {"name": f"session {session}"}})
+    return json.dumps({"traceEvents": trace_events})
@@ -0,0 +1,135 @@
+"""Copy-free history of cleaning steps applied over an immutable base dataset."""
+import uuid
+
+import numpy as np
+import pandas as pd
+
+import data_processing as dp
+import figure_cache
+
+if int(pd.__version__.split(".")[0]) < 3:
+    # Always on from pandas 3; earlier versions need it so shallow copies share columns safely.
+    pd.set_option("mode.copy_on_write", True)
+
+
+class Step:
+    """One cleaning operation: a row mask over the base frame and per-column fill values."""
+
+    __slots__ = ("label", "keep", "fills", "version")
+
+    def __init__(self, label, keep, fills):
+        self.label = label
+        self.keep = keep
+        self.fills = fills
+        self.version = uuid.uuid4().hex
+
+
+class Lineage:
+    """Cleaning history over an immutable base frame, with undo, redo and reset.
+
+    Steps only hold a boolean mask over the base rows and fill values (scalars, or per-row
+    Series covering just the filled rows), so any state is rebuilt from the base without
+    keeping full copies of the dataset around.
+    """
+
+    def __init__(self, base, version):
+        self.base = base
+        self.base_version = version
+        self.steps = []
+        self.redo_stack = []
+        self.base_bytes = int(base.memory_usage(deep=True).sum())
+        self._current = (version, base)
+        self._view_bytes = (None, 0)
+
+    @property
+    def version(self):
+        """Version token of the current state; returning to a state restores its token."""
+        return self.steps[-1].version if self.steps else self.base_version
+
+    def _base_mask(self):
+        for step in reversed(self.steps):
+            if step.keep is not None:
+                return step.keep
+        return None
+
+    @staticmethod
+    def changes(keep=None, fills=None):
+        """Whether a planned step drops any row or fills any value."""
+        return bool(fills) or (keep is not None and not np.all(keep))
+
+    def apply(self, label, keep=None, fills=None):
+        """Records a step planned against ``current()``; ``keep`` is a mask over its rows.
+
+        A step that changes nothing is not recorded, so the version and caches stay put.
+        """
+        if not self.changes(keep, fills):
+            return self.current()
+        if keep is not None:
+            previous = self._base_mask()
+            if previous is None:
+                keep = np.asarray(keep, dtype=bool).copy()
+            else:
+                base_keep = previous.copy()
+                base_keep[previous] = keep
+                keep = base_keep
+        self.steps.append(Step(label, keep, dict(fills or {})))
+        # Discarded redo steps can never be shown again, nor can their figures.
+        figure_cache.invalidate(step.version for step in self.redo_stack)
+        self.redo_stack.clear()
+        return self.current()
+
+    def versions(self):
+        """Every version token this history can still return to."""
+        return [self.base_version] + [step.version for step in self.steps + self.redo_stack]
+
+    def undo(self):
+        if self.steps:
+            self.redo_stack.append(self.steps.pop())
+        return self.current()
+
+    def redo(self):
+        if self.redo_stack:
+            self.steps.append(self.redo_stack.pop())
+        return self.current()
+
+    def reset(self):
+        """Returns to the base frame; the cleared steps can be redone one at a time."""
+        self.redo_stack.extend(reversed(self.steps))
+        self.steps.clear()
+        return self.current()
+
+    def current(self):
+        """Materializes the current state, sharing every unfilled column with the base."""
+        version, frame = self._current
+        if version == self.version:
+            return frame
+
+        frame = self.base
+        for step in self.steps:
+            if step.fills:
+                frame = dp.fill_frame(frame, step.fills)
+        keep = self._base_mask()
+        if keep is not None:
+            frame = frame[keep]
+
+        self._current = (self.version, frame)
+        return frame
+
+    def memory_usage(self):
+        """Bytes held by the base frame, the steps (masks and per-row fills) and the current
+        view beyond the base."""
+        held = {id(step.keep): step.keep.nbytes
+                for step in self.steps + self.redo_stack if step.keep is not None}
+        held.update((id(value), int(value.memory_usage(deep=True)))
+                    for step in self.steps + self.redo_stack
+                    for value in step.fills.values() if isinstance(value, pd.Series))
+        version, view = self._view_bytes
+        if version != self.version:
+            current = self.current()
+            if self._base_mask() is not None:
+                view = int(current.memory_usage(deep=True).sum())
+            else:
+                filled = list({col for step in self.steps for col in step.fills})
+                view = int(current[filled].memory_usage(deep=True, index=False).sum()) if filled else 0
+            self._view_bytes = (self.version, view)
+        return {"base": self.base_bytes, "steps": sum(held.values()), "view": view}
@@ -0,0 +1,343 @@
+"""Out-of-core datasets: large files converted to Parquet on disk and queried with DuckDB."""
+import hashlib
+import os
+import shutil
+import uuid
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+import streamlit as st
+
+try:
+    import duckdb
+except ImportError:  # out-of-core mode is simply unavailable without DuckDB
+    duckdb = None
+
+import columnar_reader
+import dataset_cache
+
+# Kept below Streamlit's default 200 MB upload limit (server.maxUploadSize) so large uploads
+# reach this mode; bigger files need that limit raised or can be opened from DATA_DIR.
+OUT_OF_CORE_THRESHOLD_BYTES = int(os.environ.get("DATAVIZ_OUT_OF_CORE_MB", "150")) << 20
+DUCKDB_MEMORY_LIMIT = os.environ.get("DATAVIZ_DUCKDB_MEMORY", "4GB")
+DATA_DIR = os.environ.get("DATAVIZ_DATA_DIR")
+OUT_OF_CORE_DIR = os.path.join(dataset_cache.CACHE_DIR, "out_of_core")
+# DuckDB's CSV reader detects gzip and zstd from the suffix, but not bz2.
+CSV_EXTENSIONS = ('.csv', '.csv.gz', '.csv.zst')
+EXTENSIONS = CSV_EXTENSIONS + columnar_reader.PARQUET_EXTENSIONS + columnar_reader.IPC_EXTENSIONS
+SAMPLE_ROWS = 200_000
+SEARCH_LIMIT = 10_000
+BOX_MAX_OUTLIERS = 500
+BOX_MAX_GROUPS = 50
+
+_NUMERIC_TYPES = {
+    "TINYINT", "SMALLINT", "INTEGER", "BIGINT", "HUGEINT", "UTINYINT", "USMALLINT",
+    "UINTEGER", "UBIGINT", "FLOAT", "DOUBLE", "DECIMAL",
+}
+_AGGREGATES = {
+    "mean": "AVG({})", "sum": "SUM({})", "count": "COUNT({})", "min": "MIN({})",
+    "max": "MAX({})", "std": "STDDEV_SAMP({})",
+}
+_QUANTILES = {"median": 0.5, "p25": 0.25, "p75": 0.75, "p90": 0.9, "p99": 0.99}
+
+
+def available():
+    return duckdb is not None
+
+
+def is_out_of_core(data):
+    return isinstance(data, DuckDataset)
+
+
+def supports(name):
+    """Whether a file of this name can be opened out of core."""
+    return name.lower().endswith(EXTENSIONS)
+
+
+def _extension(name):
+    return next(ext for ext in EXTENSIONS if name.lower().endswith(ext))
+
+
+def _quote(name):
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def _literal(text):
+    return "'" + str(text).replace("'", "''") + "'"
+
+
+def _connect():
+    con = duckdb.connect()
+    con.execute(f"SET memory_limit = {_literal(DUCKDB_MEMORY_LIMIT)}")
+    con.execute(f"SET temp_directory = {_literal(os.path.join(OUT_OF_CORE_DIR, 'spill'))}")
+    return con
+
+
+def _write_ipc_as_parquet(path, parquet_path):
+    schema, batches = columnar_reader.record_batches(path)
+    with pq.ParquetWriter(parquet_path, schema, compression="zstd") as writer:
+        for batch in batches:
+            writer.write_batch(batch)
+
+
+def convert_file(path, parquet_path):
+    """Converts a CSV, Feather or Arrow IPC file to Parquet without loading it whole.
+
+    CSVs stream through DuckDB's reader, spilling to disk as needed; Feather and IPC files
+    are rewritten one record batch at a time.
+    """
+    os.makedirs(OUT_OF_CORE_DIR, exist_ok=True)
+    tmp_path = os.path.join(OUT_OF_CORE_DIR, f".{uuid.uuid4().hex}.tmp")
+    con = None
+    try:
+        if _extension(path) in columnar_reader.IPC_EXTENSIONS:
+            _write_ipc_as_parquet(path, tmp_path)
+        else:
+            con = _connect()
+            con.execute(
+                f"COPY (SELECT * FROM read_csv_auto({_literal(path)})) "
+                f"TO {_literal(tmp_path)} (FORMAT PARQUET, COMPRESSION ZSTD)"
+            )
+        os.replace(tmp_path, parquet_path)
+    finally:
+        if con is not None:
+            con.close()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return parquet_path
+
+
+def convert_upload(file_obj, key):
+    """Spools an upload to disk and converts it to Parquet once per content key; Parquet
+    uploads are kept as they are."""
+    parquet_path = os.path.join(OUT_OF_CORE_DIR, f"{key}.parquet")
+    if os.path.exists(parquet_path):
+        return parquet_path
+    os.makedirs(OUT_OF_CORE_DIR, exist_ok=True)
+    # The spool keeps the upload's extension, which picks the reader and CSV decompression.
+    extension = _extension(file_obj.name)
+    spool_path = os.path.join(OUT_OF_CORE_DIR, f".{uuid.uuid4().hex}{extension}")
+    try:
+        file_obj.seek(0)
+        with open(spool_path, "wb") as spool:
+            shutil.copyfileobj(file_obj, spool, dataset_cache.HASH_CHUNK_BYTES)
+        if extension in columnar_reader.PARQUET_EXTENSIONS:
+            os.replace(spool_path, parquet_path)
+            return parquet_path
+        return convert_file(spool_path, parquet_path)
+    finally:
+        if os.path.exists(spool_path):
+            os.remove(spool_path)
+
+
+def convert_path(path):
+    """Returns a Parquet file for a server-side file, converting others once per path and mtime."""
+    if path.lower().endswith(columnar_reader.PARQUET_EXTENSIONS):
+        return path
+    stat = os.stat(path)
+    key = hashlib.blake2b(f"{os.path.abspath(path)}|{stat.st_size}|{stat.st_mtime_ns}".encode(),
+                          digest_size=16).hexdigest()
+    parquet_path = os.path.join(OUT_OF_CORE_DIR, f"{key}.parquet")
+    if os.path.exists(parquet_path):
+        return parquet_path
+    return convert_file(path, parquet_path)
+
+
+def server_files():
+    """Files under ``DATAVIZ_DATA_DIR`` that can be opened out of core."""
+    if not DATA_DIR or not os.path.isdir(DATA_DIR):
+        return []
+    return sorted(name for name in os.listdir(DATA_DIR) if supports(name))
+
+
+class DuckDataset:
+    """A Parquet file queried through DuckDB, exposing the aggregates the pages need."""
+
+    def __init__(self, parquet_path):
+        self.path = parquet_path
+        self._con = _connect()
+        self._con.execute(f"CREATE VIEW data AS SELECT * FROM read_parquet({_literal(parquet_path)})")
+        schema = self._query("DESCRIBE data")
+        self.columns = pd.Index(schema["column_name"].tolist())
+        self.types = dict(zip(schema["column_name"], schema["column_type"]))
+        self.n_rows = self._con.cursor().execute("SELECT COUNT(*) FROM data").fetchone()[0]
+        self.file_bytes = os.path.getsize(parquet_path)
+
+    @property
+    def shape(self):
+        return (self.n_rows, len(self.columns))
+
+    def _query(self, sql, params=None):
+        # Each cursor is its own connection to the shared database, so sessions can query
+        # the same dataset from different threads.
+        return self._con.cursor().execute(sql, params or []).df()
+
+    def _arrow(self, sql, params=None):
+        result = self._con.cursor().execute(sql, params or []).arrow()
+        return result.read_all() if hasattr(result, "read_all") else result
+
+    def is_numeric(self, col):
+        return self.types[col].split("(")[0] in _NUMERIC_TYPES
+
+    def numeric_columns(self):
+        return [col for col in self.columns if self.is_numeric(col)]
+
+    def sample(self, n=SAMPLE_ROWS):
+        """A reproducible reservoir sample of rows as an Arrow table."""
+        return self._arrow(f"SELECT * FROM data USING SAMPLE reservoir({int(n)} ROWS) REPEATABLE (0)")
+
+    def summary(self):
+        """The get_summary table computed in one scan; distinct counts are HyperLogLog estimates."""
+        exprs = ["COUNT(*)"]
+        for col in self.columns:
+            q = _quote(col)
+            exprs += [f"COUNT({q})", f"approx_count_distinct({q})"]
+            if self.is_numeric(col):
+                exprs += [f"AVG({q})", f"STDDEV_SAMP({q})", f"MIN({q})", f"MAX({q})"]
+        values = self._con.cursor().execute(f"SELECT {', '.join(exprs)} FROM data").fetchone()
+
+        n_rows, pos, rows = values[0], 1, []
+        for col in self.columns:
+            non_null, distinct = values[pos], values[pos + 1]
+            pos += 2
+            row = {
+                'Column': col, 'Type': self.types[col], 'Non-Null': non_null,
+                'Missing': n_rows - non_null,
+                '% Missing': round((n_rows - non_null) / n_rows * 100, 2) if n_rows else 0.0,
+                'Unique': distinct,
+            }
+            if self.is_numeric(col):
+                row.update(zip(['mean', 'std', 'min', 'max'],
+                               [None if v is None else float(v) for v in values[pos:pos + 4]]))
+                pos += 4
+            rows.append(row)
+        summary = pd.DataFrame(rows, columns=[
+            'Column', 'Type', 'Non-Null', 'Missing', '% Missing', 'Unique', 'mean', 'std', 'min', 'max'
+        ])
+        if not self.numeric_columns():
+            summary = summary.drop(columns=['mean', 'std', 'min', 'max'])
+        return summary.set_index('Column')
+
+    def _finite(self, col):
+        return f"CAST({_quote(col)} AS DOUBLE)", f"isfinite(CAST({_quote(col)} AS DOUBLE))"
+
+    def _range(self, expr, where):
+        lo, hi = self._con.cursor().execute(f"SELECT MIN({expr}), MAX({expr}) FROM data WHERE {where}").fetchone()
+        if lo is None:
+            return 0.0, 1.0
+        return (lo - 0.5, hi + 0.5) if lo == hi else (lo, hi)
+
+    def _bin_expr(self, expr, lo, hi, bins):
+        width = (hi - lo) / bins
+        return f"LEAST(CAST(FLOOR(({expr} - {lo!r}) / {width!r}) AS BIGINT), {bins - 1})"
+
+    def histogram_counts(self, col, bins):
+        """Same result as ``np.histogram`` over the column's finite values."""
+        expr, finite = self._finite(col)
+        lo, hi = self._range(expr, finite)
+        counts = np.zeros(bins, dtype=np.int64)
+        binned = self._query(
+            f"SELECT {self._bin_expr(expr, lo, hi, bins)} AS __bin, COUNT(*) AS __n FROM data "
+            f"WHERE {finite} GROUP BY 1"
+        )
+        counts[binned["__bin"].to_numpy()] = binned["__n"].to_numpy()
+        return counts, np.linspace(lo, hi, bins + 1)
+
+    def density_grid(self, x, y, bins):
+        """Same result as ``np.histogram2d`` over rows where both columns are finite."""
+        x_expr, x_finite = self._finite(x)
+        y_expr, y_finite = self._finite(y)
+        where = f"{x_finite} AND {y_finite}"
+        x_lo, x_hi = self._range(x_expr, where)
+        y_lo, y_hi = self._range(y_expr, where)
+        binned = self._query(
+            f"SELECT {self._bin_expr(x_expr, x_lo, x_hi, bins)} AS __bx, "
+            f"{self._bin_expr(y_expr, y_lo, y_hi, bins)} AS __by, COUNT(*) AS __n "
+            f"FROM data WHERE {where} GROUP BY 1, 2"
+        )
+        counts = np.zeros((bins, bins), dtype=np.int64)
+        counts[binned["__by"].to_numpy(), binned["__bx"].to_numpy()] = binned["__n"].to_numpy()
+        return counts, np.linspace(x_lo, x_hi, bins + 1), np.linspace(y_lo, y_hi, bins + 1)
+
+    def box_summaries(self, col, category_col=None):
+        """Box statistics per group (or for the whole column), largest groups first."""
+        expr, finite = self._finite(col)
+        group = f"CAST({_quote(category_col)} AS VARCHAR)" if category_col else _literal(col)
+        where = f"{finite} AND {group} IS NOT NULL"
+        # Internal names are prefixed so they never clash with the dataset's own columns.
+        ctes = (
+            f"WITH stats AS (SELECT {group} AS __g, COUNT(*) AS __n, AVG({expr}) AS __mean, "
+            f"quantile_cont({expr}, 0.25) AS __q1, median({expr}) AS __med, "
+            f"quantile_cont({expr}, 0.75) AS __q3 FROM data WHERE {where} "
+            f"GROUP BY 1 ORDER BY __n DESC LIMIT {BOX_MAX_GROUPS}), "
+            f"fenced AS (SELECT __g, {expr} AS __x, __q1 - 1.5 * (__q3 - __q1) AS __lo, "
+            f"__q3 + 1.5 * (__q3 - __q1) AS __hi FROM data JOIN stats ON {group} = __g "
+            f"WHERE {finite}) "
+        )
+        stats = self._query(
+            ctes + "SELECT * FROM stats JOIN ("
+            "SELECT __g, MIN(__x) FILTER (WHERE __x >= __lo) AS __lower, "
+            "MAX(__x) FILTER (WHERE __x <= __hi) AS __upper, "
+            "COUNT(*) FILTER (WHERE __x < __lo OR __x > __hi) AS __outliers "
+            "FROM fenced GROUP BY 1) USING (__g) ORDER BY __n DESC"
+        )
+        per_group = max(1, BOX_MAX_OUTLIERS // max(len(stats), 1))
+        outliers = self._query(
+            ctes + "SELECT __g, __x FROM fenced WHERE __x < __lo OR __x > __hi "
+            f"QUALIFY row_number() OVER (PARTITION BY __g ORDER BY random()) <= {per_group}"
+        )
+        by_group = {g: part["__x"].to_numpy() for g, part in outliers.groupby("__g")}
+        return [(str(row['__g']), {
+            'q1': row['__q1'], 'median': row['__med'], 'q3': row['__q3'], 'mean': row['__mean'],
+            'lowerfence': row['__lower'], 'upperfence': row['__upper'],
+            'count': int(row['__n']), 'n_outliers': int(row['__outliers']),
+            'outliers': by_group.get(row['__g'], np.array([])),
+        }) for row in stats.to_dict('records')]
+
+    def value_counts(self, col, limit):
+        q = _quote(col)
+        return self._query(
+            f"SELECT {q}, COUNT(*) AS __count FROM data WHERE {q} IS NOT NULL "
+            f"GROUP BY 1 ORDER BY 2 DESC LIMIT {int(limit)}"
+        )
+
+    def search(self, query, columns, mode="contains", limit=SEARCH_LIMIT):
+        """Returns ``(match_count, first_rows)`` for a case-insensitive search."""
+        term = _literal(query.strip().lower())
+        conditions = []
+        for col in columns:
+            text = f"lower(CAST({_quote(col)} AS VARCHAR))"
+            if mode == "prefix":
+                conditions.append(f"(starts_with({text}, {term}) OR contains({text}, ' ' || {term}))")
+            else:
+                conditions.append(f"contains({text}, {term})")
+        where = " OR ".join(conditions) or "FALSE"
+        n_matches = self._con.cursor().execute(f"SELECT COUNT(*) FROM data WHERE {where}").fetchone()[0]
+        return n_matches, self._arrow(f"SELECT * FROM data WHERE {where} LIMIT {int(limit)}")
+
+    def group_by(self, keys, values, funcs, approx_quantiles=False):
+        """SQL counterpart of ``data_processing.group_by``."""
+        exprs = []
+        for func in funcs:
+            for col in values:
+                q = _quote(col)
+                if func in _QUANTILES:
+                    quantile = "approx_quantile" if approx_quantiles else "quantile_cont"
+                    sql = f"{quantile}({q}, {_QUANTILES[func]})"
+                else:
+                    sql = _AGGREGATES[func].format(q)
+                exprs.append(f"{sql} AS {_quote(f'{func.title()} of {col}')}")
+        key_list = ", ".join(_quote(key) for key in keys)
+        not_null = " AND ".join(f"{_quote(key)} IS NOT NULL" for key in keys)
+        order = f"ORDER BY {len(keys) + 1} DESC NULLS LAST" if exprs else ""
+        return self._query(
+            f"SELECT {key_list}, {', '.join(exprs)} FROM data WHERE {not_null} "
+            f"GROUP BY {key_list} {order}"
+        )
+
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def open_dataset(parquet_path):
+    """Opens (once per process) the DuckDB view over a converted dataset."""
+    return DuckDataset(parquet_path)
@@ -1,6 +1,10 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
+import search_index as si
+import data_processing as dp
+import table_view as tv
+import sketches as sk
 
 st.markdown("""
     <style>
@@ -16,7 +20,8 @@ if "df" not in st.session_state or st.session_state.df is None:
     st.stop()
 
 
-df = st.session_state.df.copy()
+df = st.session_state.df
+dataset = st.session_state.get("ooc_dataset")
 
 st.title("Deep Analysis & Inspection")
 st.markdown("Explore your data with filtering, specific column metrics, and custom aggregations.")
@@ -33,62 +38,97 @@ with st.expander("Column Display Settings"):
 
 st.subheader("1. Interactive Data Explorer")
 
-search_query = st.text_input(
-    "Global Search", 
-    placeholder="Type to search across all columns...",
-    help="Filters rows where ANY column matches the text."
-)
-
-if search_query:
-    mask = df.astype(str).apply(
-        lambda x: x.str.contains(search_query, case=False, na=False)
-    ).any(axis=1)
-    filtered_df = df[mask]
-else:
-    filtered_df = df
+search_c1, search_c2, search_c3 = st.columns([3, 1, 1])
+
+with search_c1:
+    search_query = st.text_input(
+        "Global Search", 
+        placeholder="Type to search across all columns...",
+        help="Filters rows where ANY column matches the text."
+    )
+
+with search_c2:
+    search_scope = st.selectbox("Search In", ["All columns"] + all_cols, key="search_scope")
 
-display_df = filtered_df[selected_cols] if selected_cols else filtered_df
+with search_c3:
+    search_mode = st.selectbox("Match", list(si.SEARCH_MODES), key="search_mode")
 
-row_count = display_df.shape[0]
-col_count = display_df.shape[1]
+version = st.session_state.get("df_version")
+view_df, view_version, rows = df, version, None
+if search_query and dataset is not None:
+    scope = all_cols if search_scope == "All columns" else [search_scope]
+    n_matches, matches = dataset.search(search_query, scope, si.SEARCH_MODES[search_mode])
+    view_df, view_version = dp.arrow_to_pandas(matches), None
+    if n_matches > len(view_df):
+        st.caption(f"{n_matches:,} rows match; the first {len(view_df):,} are shown.")
+elif search_query:
+    index = si.get_index(df, version) if version else si.SearchIndex(df)
+    scope = all_cols if search_scope == "All columns" else [search_scope]
+    rows = index.search(search_query, scope, si.SEARCH_MODES[search_mode])
+elif dataset is not None:
+    st.caption(f"Out-of-core mode: browsing a {len(df):,}-row sample of {dataset.n_rows:,} rows.")
 
-st.markdown(f"**Showing {row_count:,} rows and {col_count:,} columns**")
+display_cols = selected_cols or all_cols
+row_count = len(view_df) if rows is None else len(rows)
 
-st.dataframe(
-    display_df, 
-    width='stretch', 
-    height=400
-)
+st.markdown(f"**Showing {row_count:,} rows and {len(display_cols):,} columns**")
+
+tv.render_table(view_df, "explorer", version=view_version, rows=rows, columns=display_cols)
 
 st.markdown("---")
 
 st.subheader("2. Quick Column Metrics")
 st.markdown("Select a column to analyze statistics based on the filtered data above.")
 
-if not display_df.empty:
-    target_col = st.selectbox("Select Column to Analyze", display_df.columns)
+if row_count:
+    mc1, mc2 = st.columns([3, 1])
+    with mc1:
+        target_col = st.selectbox("Select Column to Analyze", display_cols)
+    with mc2:
+        approx_metrics = st.toggle("Approximate", key="metrics_approx",
+                                   help="Median, distinct counts and top values from streaming sketches.")
 
     if target_col:
-        col_data = display_df[target_col]
+        col_data = view_df[target_col] if rows is None else view_df[target_col].iloc[rows]
         col_type = col_data.dtype
+        numeric = pd.api.types.is_numeric_dtype(col_type)
+        sketch = sk.sketch_column(col_data, quantiles=numeric, top=not numeric,
+                                  distinct=not numeric) if approx_metrics else None
 
         m1, m2, m3, m4 = st.columns(4)
 
-        if pd.api.types.is_numeric_dtype(col_type):
+        if numeric:
             avg = col_data.mean()
-            med = col_data.median()
+            med = sketch["quantiles"].quantile(0.5) if sketch else col_data.median()
             mn = col_data.min()
             mx = col_data.max()
             std = col_data.std()
             
             m1.metric("Average", f"{avg:,.2f}")
-            m2.metric("Median", f"{med:,.2f}")
+            if sketch:
+                m2.metric("Median (≈)", f"{med:,.2f}",
+                          help=f"Within ±{sketch['quantiles'].rank_error:.3%} in rank (95%).")
+            else:
+                m2.metric("Median", f"{med:,.2f}")
             m3.metric("Min / Max", f"{mn:,.0f} / {mx:,.0f}")
             m4.metric("Std Dev", f"{std:,.2f}")
             
             with st.expander("Show Distribution (Mini-Chart)"):
                 st.bar_chart(col_data.value_counts(bins=10).sort_index())
 
+        elif sketch:
+            distinct, top = sketch["distinct"], sketch["top"].top(10)
+            unique_count = distinct.estimate()
+            m1.metric("Unique Values (≈)", f"{unique_count:,.0f}",
+                      help=f"±{2 * distinct.relative_error * unique_count:,.0f} (95%).")
+            m2.metric("Most Frequent", str(top.index[0]) if len(top) else "N/A")
+            m3.metric("Freq Count (≥)", f"{top.iloc[0] if len(top) else 0:,}",
+                      help=f"Counts are at most {sketch['top'].error:,.0f} below the true count.")
+            m4.metric("Missing Values", f"{sketch['missing']:,}")
+
+            with st.expander("Show Top 10 Categories"):
+                st.table(top)
+                st.caption(f"Counts are at most {sketch['top'].error:,.0f} below the true count.")
         else:
             unique_count = col_data.nunique()
             most_freq = col_data.mode()[0] if not col_data.mode().empty else "N/A"
@@ -102,6 +142,8 @@ if not display_df.empty:
 
             with st.expander("Show Top 10 Categories"):
                 st.table(col_data.value_counts().head(10))
+        if sketch:
+            st.caption("Approximate values. Switch off **Approximate** to recompute exactly.")
 else:
     st.warning("No data available in current filter to analyze.")
 
@@ -110,33 +152,54 @@ st.markdown("---")
 st.subheader("3. Grouping & Aggregation")
 st.markdown("Create a pivot view to summarize data.")
 
-if not display_df.empty:
+if row_count:
     c1, c2, c3 = st.columns(3)
     
-    cat_cols = display_df.select_dtypes(exclude='number').columns.tolist()
-    num_cols = display_df.select_dtypes(include='number').columns.tolist()
+    display_types = view_df.dtypes[display_cols]
+    num_cols = [c for c in display_cols if pd.api.types.is_numeric_dtype(display_types[c])]
+    cat_cols = [c for c in display_cols if c not in num_cols]
+    key_options = cat_cols if cat_cols else display_cols
+    value_options = num_cols if num_cols else display_cols
     
     with c1:
-        group_col = st.selectbox("Group By (Category)", cat_cols if cat_cols else display_df.columns, key="grp_col")
+        group_cols = st.multiselect("Group By (Categories)", display_cols, default=key_options[:1], key="grp_cols")
 
     with c2:
-        agg_col = st.selectbox("Calculate Value (Numerical)", num_cols if num_cols else display_df.columns, key="agg_col")
+        agg_cols = st.multiselect("Calculate Values (Numerical)", display_cols, default=value_options[:1], key="agg_cols")
         
     with c3:
-        agg_func = st.selectbox("Function", ["mean", "sum", "count", "min", "max", "std"], key="agg_func")
+        agg_funcs = st.multiselect("Functions", dp.GROUPBY_FUNCS, default=["mean"], key="agg_funcs")
+
+    approx = st.checkbox(
+        "Approximate quantiles (faster on large data)",
+        value=row_count > dp.QUANTILE_SAMPLE_ROWS,
+        help=f"Quantiles are estimated from a random sample of {dp.QUANTILE_SAMPLE_ROWS:,} rows.",
+        key="agg_approx"
+    )
         
     if st.button("Generate Summary Table"):
-        try:
-            grouped_df = display_df.groupby(group_col)[agg_col].agg(agg_func).reset_index()
-            
-            grouped_df.columns = [group_col, f"{agg_func.title()} of {agg_col}"]
-            
-            sort_col = grouped_df.columns[1]
-            grouped_df = grouped_df.sort_values(by=sort_col, ascending=False)
-            
-            st.dataframe(grouped_df, width='stretch')
-            
-        except Exception as e:
-            st.error(f"Could not group data: {e}. Try selecting different columns.")
+        if not group_cols or not agg_cols or not agg_funcs:
+            st.warning("Pick at least one group column, value column and function.")
+        else:
+            try:
+                if dataset is not None:
+                    # Without a search the whole on-disk dataset is grouped, not just the sample.
+                    source = view_df if search_query else dataset
+                    grouped = dp.group_by(source, group_cols, agg_cols, agg_funcs, approx_quantiles=approx)
+                else:
+                    grouped = dp.group_by(
+                        df, group_cols, agg_cols, agg_funcs,
+                        version=version, rows=rows, approx_quantiles=approx
+                    )
+                st.session_state.group_result = (version, grouped)
+                st.session_state.group_table_page = 1
+            except Exception as e:
+                st.session_state.group_result = None
+                st.error(f"Could not group data: {e}. Try selecting different columns.")
+
+    result_version, grouped_df = st.session_state.get("group_result") or (None, None)
+    if grouped_df is not None and result_version == st.session_state.get("df_version"):
+        st.markdown(f"**{len(grouped_df):,} groups**")
+        tv.render_table(grouped_df, "group_table")
 else:
-    st.info("Upload data to use aggregation tools.")
\ No newline at end of file
+    st.info("Upload data to use aggregation tools.")
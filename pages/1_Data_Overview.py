@@ -16,22 +16,35 @@ if "df" not in st.session_state or st.session_state.df is None:
     st.stop()
 
 df = st.session_state.df
+dataset = st.session_state.get("ooc_dataset")
+data = dataset or df
+version = st.session_state.get("df_version")
+approx = st.session_state.get("overview_approx", False) and dataset is None
+summary = dp.get_summary(data, version=version, approx=approx)
 
 st.title("Data Overview")
 
 st.header("Key Dataset Metrics")
 col1, col2, col3, col4 = st.columns(4)
-col1.metric("Total Rows", f"{df.shape[0]:,}")
-col2.metric("Total Columns", f"{df.shape[1]:,}")
-col3.metric("Missing Cells", f"{df.isnull().sum().sum():,}")
-size_bytes = df.memory_usage(deep=True).sum()
-def format_bytes(size):
-    for unit in ["B", "KB", "MB", "GB", "TB"]:
-        if size < 1024:
-            return f"{size:.2f} {unit}"
-        size /= 1024
-    return f"{size:.2f} TB"
-col4.metric("Memory Usage", format_bytes(size_bytes))
+col1.metric("Total Rows", f"{data.shape[0]:,}")
+col2.metric("Total Columns", f"{data.shape[1]:,}")
+col3.metric("Missing Cells", f"{int(summary['Missing'].sum()) if not summary.empty else 0:,}")
+if dataset is not None:
+    col4.metric("On-Disk Size (Parquet)", dp.format_bytes(dataset.file_bytes))
+else:
+    col4.metric("Memory Usage", dp.format_bytes(df.memory_usage(deep=True).sum()))
+
+original_df = st.session_state.get("original_df")
+if original_df is not None and original_df.attrs.get("memory_before"):
+    with st.expander("Memory Optimization (as uploaded)"):
+        report = dp.memory_report(original_df)
+        total_before = report["Bytes Before"].sum()
+        total_after = report["Bytes After"].sum()
+        st.markdown(
+            f"Column types were compacted on load: **{dp.format_bytes(total_before)}** → "
+            f"**{dp.format_bytes(total_after)}** ({total_before / max(total_after, 1):.1f}x smaller)."
+        )
+        st.dataframe(report, width='stretch')
 
 
 
@@ -39,12 +52,28 @@ st.markdown("---")
 
 st.header("Detailed Column Summary")
 st.markdown("View data types, missing counts, unique values, and descriptive statistics.")
+if dataset is None:
+    st.toggle(
+        "Approximate distinct counts (faster on huge data)",
+        help="Estimates unique values of text and float columns with HyperLogLog sketches and shows their 95% error bound.",
+        key="overview_approx"
+    )
+    if approx:
+        st.button("Recompute Exactly", key="overview_exact_btn",
+                  on_click=lambda: st.session_state.update(overview_approx=False))
 with st.expander("Expand to see full summary table", expanded=True):
-    st.dataframe(dp.get_summary(df), width='stretch')
+    st.dataframe(summary, width='stretch')
 
 st.markdown("---")
 
 st.header("Missing Data Pattern")
 st.markdown("A heatmap showing where missing values are located (Red = Missing).")
-viz.plot_missing_data_heatmap(df)
+if dataset is not None:
+    st.caption(f"Out-of-core mode: drawn from a {len(df):,}-row sample of the dataset.")
+row_range = None
+if len(df) > viz.MISSING_HEATMAP_BINS:
+    st.caption(f"Rows are grouped into {viz.MISSING_HEATMAP_BINS:,} bins; each cell shows the fraction missing.")
+    with st.expander("Zoom into a row range"):
+        row_range = st.slider("Rows", 0, len(df), (0, len(df)), key="missing_zoom")
+viz.plot_missing_data_heatmap(df, row_range=row_range, version=version)
 
@@ -1,5 +1,7 @@
 import streamlit as st
 import data_processing as dp
+import lineage
+import table_view as tv
 import pandas as pd
 
 st.markdown("""
@@ -14,10 +16,22 @@ if "df" not in st.session_state or st.session_state.df is None:
     st.warning("Please upload a dataset on the **Home** page to proceed.")
     st.stop()
 
-df = st.session_state.df
+if st.session_state.get("ooc_dataset") is not None:
+    st.info("Cleaning is not available in out-of-core mode; the on-disk dataset is read-only.")
+    st.stop()
+
+if st.session_state.get("lineage") is None:
+    st.session_state.lineage = lineage.Lineage(st.session_state.df, st.session_state.get("df_version") or dp.new_version())
+history = st.session_state.lineage
+df = history.current()
+
+def publish(frame):
+    """Makes the lineage's current state the dataset every page reads."""
+    st.session_state.df = frame
+    st.session_state.df_version = history.version
 
 st.title("Clean & Transform")
-tab1, tab2, tab3 = st.tabs(["Handle Missing Values", "Remove Outliers (IQR)", "Reset Data"])
+tab1, tab2, tab3 = st.tabs(["Handle Missing Values", "Remove Outliers", "History & Reset"])
 
 with tab1:
     st.header("Handle Missing Values")
@@ -38,31 +52,45 @@ with tab1:
             key="missing_cols_select"
         )
         
-        strategy_options = {
-            "Drop Rows": "drop_rows",
-            "Fill with Mean (Numerical only)": "mean",
-            "Fill with Median (Numerical only)": "median",
-            "Fill with Mode (All types)": "mode"
-        }
-        
         selected_strategy_name = st.selectbox(
             "Select Imputation/Drop Strategy", 
-            list(strategy_options.keys()), 
+            list(dp.IMPUTE_STRATEGIES.keys()), 
             key="missing_strategy_select"
         )
-        strategy = strategy_options[selected_strategy_name]
+        strategy = dp.IMPUTE_STRATEGIES[selected_strategy_name]
         
-        if st.button("Apply Cleaning Operation", type="primary", key="apply_cleaning_btn"):
-            cleaned = dp.clean_missing(df, strategy, cols)
-            st.session_state.df = cleaned
-            st.toast("Cleaning applied successfully!")
-            st.rerun()
+        group_col = order_col = None
+        if strategy in ("group_mean", "group_median"):
+            group_options = [c for c in df.columns if c not in cols and not pd.api.types.is_float_dtype(df[c])]
+            group_options.sort(key=lambda c: pd.api.types.is_numeric_dtype(df[c]))
+            if not group_options:
+                st.warning("No categorical column is available to group by.")
+            group_col = st.selectbox("Group By (fill with each group's statistic)", group_options,
+                                     key="missing_group_select")
+        elif strategy in ("ffill", "bfill"):
+            order_col = st.selectbox("Order Rows By", ["(original order)"] + list(df.columns),
+                                     key="missing_order_select")
+            if order_col == "(original order)":
+                order_col = None
+        elif strategy == "knn":
+            st.caption(f"Each gap is filled from the {dp.KNN_NEIGHBORS} most similar rows, "
+                       f"compared on all numerical columns and searched among a sample of "
+                       f"{dp.KNN_REFERENCE_ROWS:,} complete rows.")
+        
+        if st.button("Apply Cleaning Operation", type="primary", key="apply_cleaning_btn",
+                     disabled=strategy in ("group_mean", "group_median") and group_col is None):
+            keep, fills = dp.plan_clean_missing(df, strategy, cols, group_col, order_col)
+            if history.changes(keep, fills):
+                publish(history.apply(f"Missing values: {selected_strategy_name} ({len(cols)} columns)", keep, fills))
+                st.toast("Cleaning applied successfully!")
+                st.rerun()
+            st.info("Nothing changed, so no step was recorded.")
 
 with tab2:
-    st.header("Remove Outliers (IQR Method)")
-    st.markdown("Identify and remove extreme values in numerical columns using the Interquartile Range (IQR) method.")
+    st.header("Remove Outliers")
+    st.markdown("Identify and remove extreme values in numerical columns. Review the flagged rows per column before dropping anything.")
     
-    num_cols = df.select_dtypes(include='number').columns.tolist()
+    num_cols = [c for c in df.select_dtypes(include='number').columns if not pd.api.types.is_bool_dtype(df[c])]
     if not num_cols:
         st.info("No numerical columns found to check for outliers.")
     else:
@@ -72,25 +100,81 @@ with tab2:
             default=num_cols, 
             key="outlier_cols_select"
         )
+        oc1, oc2 = st.columns(2)
+        with oc1:
+            method_label = st.selectbox("Method", list(dp.OUTLIER_METHODS), key="outlier_method")
+        method = dp.OUTLIER_METHODS[method_label]
+        with oc2:
+            threshold = st.number_input(
+                "Expected outlier fraction" if method == "isolation_forest" else "Threshold",
+                min_value=0.001 if method == "isolation_forest" else 0.1,
+                max_value=0.5 if method == "isolation_forest" else 10.0,
+                value=dp.OUTLIER_THRESHOLDS[method],
+                help={
+                    "iqr": "Rows beyond Q1 - k·IQR or Q3 + k·IQR are flagged.",
+                    "zscore": "Rows more than this many standard deviations from the mean are flagged.",
+                    "mad": "Rows whose robust z-score (median and MAD based) exceeds this are flagged.",
+                    "isolation_forest": "Share of rows the forest flags, scoring all selected columns together.",
+                }[method],
+                key=f"outlier_threshold_{method}"
+            )
+        approx_quartiles = False
+        if method in ("iqr", "mad"):
+            approx_quartiles = st.checkbox(
+                "Approximate quantiles (faster on huge data)",
+                help="Quantiles come from a streaming quantile sketch, accurate to a fraction of a percent in rank.",
+                key="outlier_approx"
+            )
+
+        if cols_outlier:
+            keep, preview, _ = dp.get_outlier_mask(
+                df, cols_outlier, method, threshold, approx_quartiles, version=history.version
+            )
+            flagged_rows = len(keep) - int(keep.sum())
+            st.markdown(f"**Preview:** {flagged_rows:,} rows ({flagged_rows / max(len(df), 1):.2%}) would be removed.")
+            st.dataframe(preview, width='stretch')
+
         if st.button("Remove Outliers", type="primary", key="remove_outliers_btn"):
-            cleaned = dp.remove_outliers_iqr(df, cols_outlier)
-            st.session_state.df = cleaned
-            st.toast("Outlier removal applied!")
-            st.rerun()
+            keep = dp.plan_remove_outliers(
+                df, cols_outlier, method, threshold, approx_quartiles, version=history.version
+            )
+            if history.changes(keep):
+                publish(history.apply(f"Remove outliers ({method_label}, {len(cols_outlier)} columns)", keep))
+                st.toast("Outlier removal applied!")
+                st.rerun()
+            st.info("Nothing changed, so no step was recorded.")
 
 with tab3:
-    st.header("Reset Data")
-    st.markdown("Revert your dataset to the state right after the initial upload.")
-    
-    if st.button("Reset to Original Data", type="secondary", key="reset_data_btn"):
-        if st.session_state.original_df is not None:
-            st.session_state.df = st.session_state.original_df.copy()
-            st.success("Data reset to original state!")
+    st.header("History & Reset")
+    st.markdown("Every cleaning step is recorded over the original upload, so you can step back and forth without extra copies of the data.")
+
+    if history.steps:
+        for i, step in enumerate(history.steps, start=1):
+            st.markdown(f"{i}. {step.label}")
+    else:
+        st.info("No cleaning steps applied yet.")
+
+    h1, h2, h3 = st.columns(3)
+    with h1:
+        if st.button("Undo", disabled=not history.steps, key="undo_btn"):
+            publish(history.undo())
+            st.rerun()
+    with h2:
+        if st.button("Redo", disabled=not history.redo_stack, key="redo_btn"):
+            publish(history.redo())
+            st.rerun()
+    with h3:
+        if st.button("Reset to Original Data", type="secondary", key="reset_data_btn"):
+            publish(history.reset())
             st.toast("Dataset reset!")
             st.rerun()
-        else:
-            st.error("Original data not found. Please re-upload.")
+
+    usage = history.memory_usage()
+    m1, m2, m3 = st.columns(3)
+    m1.metric("Original Data", dp.format_bytes(usage["base"]))
+    m2.metric("Step Masks", dp.format_bytes(usage["steps"]))
+    m3.metric("Current View (extra)", dp.format_bytes(usage["view"]))
 
 st.markdown("---")
 st.subheader("Current Data Snapshot")
-st.data_editor(df.head(10), width='stretch')
\ No newline at end of file
+tv.render_table(df, "clean_table", version=history.version)
\ No newline at end of file
@@ -15,6 +15,7 @@ if "df" not in st.session_state or st.session_state.df is None:
     st.stop()
 
 df = st.session_state.df
+data = st.session_state.get("ooc_dataset") or df
 
 st.title("Univariate Plots")
 st.markdown("Analyze the distribution of a single column.")
@@ -36,10 +37,13 @@ else:
         horizontal=True
     )
     
+    version = st.session_state.get("df_version")
     if plot_type_num == "Histogram & Box Plot":
-        viz.plot_histogram(df, col_num)
+        bins = st.slider("Number of Bins", min_value=10, max_value=200,
+                         value=viz.HISTOGRAM_BINS, step=10, key="univar_bins")
+        viz.plot_histogram(data, col_num, bins=bins, version=version)
     elif plot_type_num == "Box Plot (Individual)":
-        viz.plot_box_plot(df, col_num)
+        viz.plot_box_plot(data, col_num, version=version)
 
 st.markdown("---")
 
@@ -59,4 +63,5 @@ else:
         key="cat_limit"
     )
     
-    viz.plot_bar_chart_categorical(df, col_cat, limit=plot_limit)
\ No newline at end of file
+    viz.plot_bar_chart_categorical(data, col_cat, limit=plot_limit,
+                                   version=st.session_state.get("df_version"))
\ No newline at end of file
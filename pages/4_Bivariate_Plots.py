@@ -1,5 +1,6 @@
 import streamlit as st
 import visualization as viz
+import data_processing as dp
 import pandas as pd
 
 st.markdown("""
@@ -15,9 +16,15 @@ if "df" not in st.session_state or st.session_state.df is None:
     st.stop()
 
 df = st.session_state.df
+data = st.session_state.get("ooc_dataset") or df
 
 st.title("Bivariate & Multivariate Plots")
 st.markdown("Explore relationships between two or more variables.")
+if data is not df:
+    st.caption(
+        f"Out-of-core mode: box plots and density heatmaps use all {data.shape[0]:,} rows; "
+        f"scatter, correlation and pair plots use a {len(df):,}-row sample."
+    )
 
 num_cols = df.select_dtypes(include='number').columns.tolist()
 cat_cols = [c for c in df.columns if c not in num_cols]
@@ -40,7 +47,7 @@ with tab1:
             color_by = st.selectbox("Color by (Category)", color_options, key="bivar_color")
         
         color_by_col = None if color_by == "None" else color_by
-        viz.plot_scatter(df, x, y, color_by_col)
+        viz.plot_scatter(df, x, y, color_by_col, version=st.session_state.get("df_version"))
 
 with tab2:
     st.header("Grouped Box Plot (Numerical vs Categorical)")
@@ -53,7 +60,7 @@ with tab2:
         with col2:
             cat_col_box = st.selectbox("Grouping Category (X-axis)", cat_cols, key="box_cat")
             
-        viz.plot_box_plot(df, num_col_box, cat_col_box)
+        viz.plot_box_plot(data, num_col_box, cat_col_box, version=st.session_state.get("df_version"))
 
 with tab3:
     st.header("2D Density Heatmap")
@@ -67,22 +74,49 @@ with tab3:
         with col2:
             y_den = st.selectbox("Y-axis (Density)", [c for c in num_cols if c != x_den], key="den_y")
             
-        viz.plot_density_heatmap(df, x_den, y_den)
+        col3, col4 = st.columns(2)
+        with col3:
+            den_bins = st.slider("Bins per Axis", min_value=20, max_value=300,
+                                 value=viz.DENSITY_BINS, step=10, key="den_bins")
+        with col4:
+            den_log = st.checkbox("Log-scaled color", value=True, key="den_log")
+
+        viz.plot_density_heatmap(data, x_den, y_den, bins=den_bins, log_color=den_log,
+                                 version=st.session_state.get("df_version"))
 
 with tab4:
     st.header("Correlation Heatmap & Pair Plot")
     
     st.subheader("Numerical Correlation Heatmap")
-    viz.plot_correlation_heatmap(df)
+    c1, c2 = st.columns(2)
+    with c1:
+        corr_method = st.radio("Method", ["Pearson", "Spearman"], horizontal=True, key="corr_method")
+    with c2:
+        corr_order = st.radio("Column Order", ["Original", "Clustered"], horizontal=True, key="corr_order")
+    version = st.session_state.get("df_version")
+    viz.plot_correlation_heatmap(df, corr_method.lower(), corr_order == "Clustered", version=version)
+
+    if len(num_cols) >= 2:
+        st.subheader("Most Correlated Pairs")
+        top_k = st.slider("Number of Pairs", min_value=5, max_value=100, value=20, step=5, key="corr_top_k")
+        corr, _ = dp.get_correlation(df, corr_method.lower(), version)
+        st.dataframe(dp.top_correlated_pairs(corr, top_k), width='stretch', hide_index=True)
     
     st.markdown("---")
     
-    st.subheader("Pair Plot (Up to 5 Numerical Columns)")
-    st.markdown("Warning: Can be slow on large datasets!")
+    st.subheader(f"Pair Plot (Up to {viz.PAIRPLOT_MAX_COLS} Numerical Columns)")
+    st.markdown(f"Datasets over {viz.PAIRPLOT_POINT_BUDGET:,} rows are sampled and drawn as binned densities.")
     
     if len(num_cols) >= 2:
+        pair_cols = st.multiselect(
+            "Columns",
+            num_cols,
+            default=num_cols[:5],
+            max_selections=viz.PAIRPLOT_MAX_COLS,
+            key="pair_plot_cols"
+        )
         if st.button("Generate Pair Plot", key="show_pair_plot_btn"):
             with st.spinner("Generating Pair Plot... (800px tall)"):
-                viz.plot_pairplot(df)
+                viz.plot_pairplot(df, pair_cols, version=st.session_state.get("df_version"))
     else:
         st.info("Need at least two numerical columns for a Pair Plot.")
\ No newline at end of file
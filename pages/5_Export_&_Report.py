@@ -1,7 +1,8 @@
+import os
 import streamlit as st
 import data_processing as dp
+import export
 import pandas as pd
-import io
 
 st.markdown("""
     <style>
@@ -16,34 +17,60 @@ if "df" not in st.session_state or st.session_state.df is None:
     st.stop()
 
 df = st.session_state.df
+dataset = st.session_state.get("ooc_dataset")
 
 st.title("Export & Final Report")
+
+if dataset is not None:
+    st.header("Download Data")
+    size = os.path.getsize(dataset.path)
+    if size <= export.DOWNLOAD_MAX_BYTES:
+        st.markdown("The dataset is held out of core; download it as the Parquet file it is queried from.")
+        st.download_button(
+            "Download as Parquet",
+            data=lambda: export.file_bytes(dataset.path),
+            file_name="data.parquet",
+            mime=export.EXPORT_FORMATS["Parquet"][1],
+            key="download_ooc_btn"
+        )
+    else:
+        st.markdown(
+            f"The dataset is held out of core as a {dp.format_bytes(size)} Parquet file, too large "
+            "to send through the browser. Copy it from the server instead:"
+        )
+        st.code(dataset.path, language=None)
+    st.markdown("---")
+    st.header("Dataset Summary")
+    st.dataframe(dp.get_summary(dataset, version=st.session_state.get("df_version")), width='stretch')
+    st.stop()
 st.header("Download Cleaned Data")
 st.markdown("Download your current, cleaned dataset in your preferred format.")
 
+version = st.session_state.get("df_version")
+formats = list(export.EXPORT_FORMATS)
+if len(df) > export.EXCEL_MAX_ROWS:
+    formats.remove("Excel (.xlsx)")
+
 col1, col2 = st.columns(2)
 
 with col1:
-    st.download_button(
-        "Download as CSV",
-        df.to_csv(index=False).encode('utf-8'),
-        "cleaned_data.csv",
-        "text/csv",
-        key="download_csv_btn"
+    export_format = st.selectbox(
+        "Format",
+        formats,
+        help="Parquet, Feather and compressed CSV are much faster and smaller for large datasets.",
+        key="export_format"
     )
 
 with col2:
-    excel_buffer = io.BytesIO()
-    df.to_excel(excel_buffer, index=False, engine='openpyxl')
-    excel_buffer.seek(0)
-    
+    ext, mime = export.EXPORT_FORMATS[export_format]
     st.download_button(
-        "Download as Excel (.xlsx)",
-        data=excel_buffer,
-        file_name="cleaned_data.xlsx",
-        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        key="download_excel_btn"
+        f"Download as {export_format}",
+        data=lambda: export.export_bytes(df, export_format, version),
+        file_name=f"cleaned_data.{ext}",
+        mime=mime,
+        key="download_btn"
     )
+    st.caption("The file is generated when you click, and reused until the data changes.")
 
 st.markdown("---")
 
@@ -52,7 +79,8 @@ st.header("Final Data Report Summary")
 final_rows = df.shape[0]
 original_rows = st.session_state.original_df.shape[0] if st.session_state.original_df is not None else final_rows
 rows_removed = original_rows - final_rows
-missing_remaining = df.isnull().sum().sum()
+summary = dp.get_summary(df, version=version)
+missing_remaining = int(summary["Missing"].sum()) if not summary.empty else 0
 
 col_a, col_b, col_c = st.columns(3)
 col_a.metric("Original Rows", f"{original_rows:,}")
@@ -67,7 +95,7 @@ st.markdown(f"""
 """)
 
 with st.expander("Show Final Detailed Data Summary"):
-    st.dataframe(dp.get_summary(df), width='stretch')
+    st.dataframe(summary, width='stretch')
 
 st.markdown("---")
 st.caption("Thank you for using Data-Viz Pro!")
\ No newline at end of file
@@ -0,0 +1,135 @@
+import streamlit as st
+import pandas as pd
+import data_processing as dp
+import dataset_store
+import figure_cache
+import instrumentation as tr
+
+st.markdown("""
+    <style>
+    .st-emotion-cache-scp8yw {
+        display: none !important;
+    }
+    </style>
+""", unsafe_allow_html=True)
+st.logo("assets/logo.svg",size="large")
+
+st.title("Diagnostics")
+st.markdown("Memory held by sessions and the shared dataset store, and where the time goes.")
+
+st.header("Session Memory")
+history = st.session_state.get("lineage")
+m1, m2, m3, m4 = st.columns(4)
+if history is not None:
+    usage = history.memory_usage()
+    m1.metric("Base Dataset", dp.format_bytes(usage["base"]))
+    m2.metric("Cleaning Steps", dp.format_bytes(usage["steps"]))
+    m3.metric("Current View", dp.format_bytes(usage["view"]))
+else:
+    m1.metric("Base Dataset", "—")
+rss, max_rss = tr.current_rss(), tr.max_rss()
+m4.metric("Process RSS", dp.format_bytes(rss) if rss else "—",
+          help=f"Peak: {dp.format_bytes(max_rss)}" if max_rss else None)
+
+st.markdown("---")
+
+st.header("Shared Dataset Store")
+st.markdown(
+    f"Datasets loaded by any session. Recently used ones are kept in memory up to "
+    f"**{dp.format_bytes(dataset_store.STORE_BUDGET_BYTES)}**; beyond that a dataset stays "
+    f"resident only while a session holds it and is otherwise reloaded from the disk cache."
+)
+resident = pd.DataFrame(dataset_store.stats())
+if resident.empty:
+    st.info("No datasets are resident.")
+else:
+    s1, s2 = st.columns(2)
+    s1.metric("Resident Datasets", f"{len(resident):,}")
+    s2.metric("Resident Memory", dp.format_bytes(resident["bytes"].sum()))
+    resident["bytes"] = resident["bytes"].map(dp.format_bytes)
+    for col in ("loaded", "last_used"):
+        resident[col] = pd.to_datetime(resident[col], unit="s")
+    st.dataframe(resident.drop(columns="key"), width='stretch', hide_index=True)
+    if st.button("Unpin Idle Datasets", key="evict_idle_btn",
+                 help="Frees every dataset that no session currently holds."):
+        dataset_store.evict_idle()
+        st.rerun()
+
+st.markdown("---")
+
+st.header("Figure Cache")
+figures = figure_cache.stats()
+st.markdown(
+    f"Rendered charts kept per dataset version and plot settings, up to "
+    f"**{dp.format_bytes(figures['budget'])}**, so reruns and revisits skip rebuilding them."
+)
+f1, f2, f3 = st.columns(3)
+f1.metric("Cached Figures", f"{figures['entries']:,}")
+f2.metric("Cache Memory", dp.format_bytes(figures["bytes"]))
+lookups = figures["hits"] + figures["misses"]
+f3.metric("Hit Rate", f"{figures['hits'] / lookups:.0%}" if lookups else "—")
+if st.button("Clear Figure Cache", key="clear_figure_cache_btn"):
+    figure_cache.clear()
+    st.rerun()
+
+st.markdown("---")
+
+st.header("Recorded Operations")
+if not tr.TRACE_ENABLED:
+    st.info("Instrumentation is turned off. Remove `DATAVIZ_TRACE=0` from the environment to record timings.")
+    st.stop()
+
+scope = st.radio("Scope", ["This session", "All sessions"], horizontal=True, key="diag_scope")
+session = tr.current_session() if scope == "This session" else None
+recorded = tr.events(session)
+
+if not recorded:
+    st.info("Nothing recorded yet. Visit the other pages, then come back.")
+    st.stop()
+
+events = pd.DataFrame(recorded)
+events["seconds"] = events["seconds"].astype("float64")
+
+pages = ["All pages"] + sorted(events["page"].unique())
+page = st.selectbox("Page", pages, key="diag_page")
+if page != "All pages":
+    events = events[events["page"] == page]
+
+st.subheader("Slowest Operations")
+totals = events.groupby(["page", "name"]).agg(
+    Calls=("seconds", "size"),
+    Total=("seconds", "sum"),
+    Mean=("seconds", "mean"),
+    Max=("seconds", "max"),
+    Rows=("rows", "max"),
+    Payload=("payload_bytes", "max"),
+    Memory=("rss_delta", "max"),
+).sort_values("Total", ascending=False).reset_index()
+for col in ("Payload", "Memory"):
+    totals[col] = totals[col].map(lambda b: dp.format_bytes(b) if pd.notna(b) else "")
+st.dataframe(totals.rename(columns={"page": "Page", "name": "Operation", "Total": "Total (s)",
+                                    "Mean": "Mean (s)", "Max": "Max (s)", "Memory": "Max RSS Growth"}),
+             width='stretch', hide_index=True)
+if not tr.TRACE_PAYLOAD:
+    st.caption("Figure payload sizes are recorded only with `DATAVIZ_TRACE_PAYLOAD=1`.")
+
+st.subheader("Slowest Calls")
+slowest = events.nlargest(20, "seconds")[["start", "page", "name", "seconds", "rows", "payload_bytes", "rss_delta"]]
+slowest["start"] = pd.to_datetime(slowest["start"], unit="s")
+st.dataframe(slowest, width='stretch', hide_index=True)
+
+c1, c2 = st.columns(2)
+with c1:
+    st.download_button(
+        "Download Trace (Chrome/Perfetto JSON)",
+        data=lambda: tr.chrome_trace(tr.events(session)),
+        file_name="data-viz-trace.json",
+        mime="application/json",
+        key="download_trace_btn"
+    )
+with c2:
+    if st.button("Clear Recorded Operations", key="clear_trace_btn"):
+        tr.clear(session)
+        st.rerun()
+st.caption(f"Up to {tr.TRACE_MAX_EVENTS:,} operations are kept per session. "
+           "Open the trace in https://ui.perfetto.dev for a timeline view.")
@@ -0,0 +1,120 @@
+"""Cached inverted search index for the Deep Analysis global search."""
+import threading
+import weakref
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import streamlit as st
+
+SEARCH_MODES = {"Contains": "contains", "Word starts with": "prefix"}
+_MAX_CODEPOINT = "\U0010ffff"
+
+
+def _smallest_signed(n):
+    """Smallest signed integer dtype that holds codes 0..n-1 and -1."""
+    for dtype in (np.int8, np.int16, np.int32):
+        if n < np.iinfo(dtype).max:
+            return dtype
+    return np.int64
+
+
+def _lower_strings(values):
+    """Casts an array of distinct values to lowercase Arrow strings."""
+    try:
+        strings = pa.array(values).cast(pa.string())
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+        strings = pa.array(pd.Series(values).astype(str).to_numpy(dtype=object), type=pa.string())
+    return pc.utf8_lower(strings)
+
+
+class _ColumnIndex:
+    """Lowercase strings of one column's distinct values, plus a lazily built token index."""
+
+    def __init__(self, series):
+        codes, uniques = pd.factorize(series)
+        self.codes = codes.astype(_smallest_signed(len(uniques)))
+        self.values = _lower_strings(uniques)
+        self._tokens = None
+        self._token_ids = None
+
+    def _build_tokens(self):
+        words = pc.utf8_split_whitespace(self.values)
+        tokens = pc.list_flatten(words)
+        order = pc.sort_indices(tokens)
+        self._tokens = tokens.take(order).to_numpy(zero_copy_only=False)
+        self._token_ids = pc.list_parent_indices(words).take(order).to_numpy()
+
+    def contains(self, term):
+        """Ids of distinct values containing ``term``."""
+        matches = pc.match_substring(self.values, term).to_numpy(zero_copy_only=False)
+        return np.flatnonzero(matches)
+
+    def prefix(self, term):
+        """Ids of distinct values with a whitespace-separated word starting with ``term``."""
+        if self._tokens is None:
+            self._build_tokens()
+        lo = np.searchsorted(self._tokens, term, side="left")
+        hi = np.searchsorted(self._tokens, term + _MAX_CODEPOINT, side="left")
+        return np.unique(self._token_ids[lo:hi])
+
+    def row_mask(self, value_ids):
+        """Boolean row mask for rows holding any of ``value_ids``; missing values never match."""
+        lookup = np.zeros(len(self.values) + 1, dtype=bool)
+        lookup[value_ids] = True
+        return lookup[self.codes]
+
+
+class SearchIndex:
+    """Per-column search structures for one dataset version, built on first use."""
+
+    def __init__(self, df):
+        self._df = weakref.ref(df)
+        self._columns = {}
+        self._lock = threading.Lock()
+        self.n_rows = len(df)
+
+    def attach(self, df):
+        """Points the index at ``df`` if its frame was freed.
+
+        Undo and redo rebuild an equal frame for a version already seen, so the column
+        structures built so far stay valid for it.
+        """
+        with self._lock:
+            if self._df() is None:
+                self._df = weakref.ref(df)
+
+    def _column(self, col):
+        with self._lock:
+            if col not in self._columns:
+                df = self._df()
+                if df is None:
+                    raise RuntimeError("The dataset for this search index is no longer loaded.")
+                self._columns[col] = _ColumnIndex(df[col])
+            return self._columns[col]
+
+    def search(self, query, columns, mode="contains"):
+        """Returns the sorted positions of rows where any of ``columns`` matches ``query``."""
+        term = query.strip().lower()
+        if not term:
+            return np.arange(self.n_rows)
+        mask = np.zeros(self.n_rows, dtype=bool)
+        for col in columns:
+            index = self._column(col)
+            value_ids = index.prefix(term) if mode == "prefix" else index.contains(term)
+            if len(value_ids):
+                mask |= index.row_mask(value_ids)
+        return np.flatnonzero(mask)
+
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def _cached_index(_df, version):
+    return SearchIndex(_df)
+
+
+def get_index(df, version):
+    """Returns the shared search index for a dataset version."""
+    index = _cached_index(df, version)
+    index.attach(df)
+    return index
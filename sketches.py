@@ -0,0 +1,251 @@
+"""Mergeable streaming sketches for approximate distinct counts, quantiles and top values.
+
+Each sketch is updated chunk by chunk, can be merged with another of the same kind, and
+reports an error bound alongside its estimate.
+"""
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+try:
+    import duckdb
+except ImportError:  # strings are hashed by pandas instead
+    duckdb = None
+
+SKETCH_CHUNK_ROWS = 1_000_000
+
+
+def _hash(values):
+    """64-bit hashes of a Series' values, in no particular order.
+
+    Text is hashed by DuckDB when it is installed, many times faster than pandas;
+    categoricals hash each category only once.
+    """
+    if (duckdb is not None and pd.api.types.is_string_dtype(values)
+            and not isinstance(values.dtype, pd.CategoricalDtype)):
+        chunk = pa.table({"v": pa.array(values.array, type=pa.large_string())})
+        with duckdb.connect() as con:
+            con.register("chunk", chunk)
+            result = con.execute("SELECT hash(v) FROM chunk").arrow()
+            result = result.read_all() if hasattr(result, "read_all") else result
+            return result.column(0).to_numpy()
+    return pd.util.hash_pandas_object(values, index=False, categorize=False).to_numpy()
+
+
+def _bit_length(x):
+    """Exact bit length of each uint64, via float64 on 32-bit halves."""
+    bits = np.frexp((x >> np.uint64(32)).astype(np.float64))[1] + 32
+    # The low half only matters for the rare values whose high half is zero.
+    low = bits == 32
+    if low.any():
+        bits[low] = np.frexp((x[low] & np.uint64(0xFFFFFFFF)).astype(np.float64))[1]
+    return bits
+
+
+def _merge_sorted(a, b):
+    """Merges two sorted arrays in linear time after a binary search of ``b`` in ``a``."""
+    if not len(a):
+        return b
+    if not len(b):
+        return a
+    positions = np.searchsorted(a, b, side='right') + np.arange(len(b))
+    merged = np.empty(len(a) + len(b), dtype=np.result_type(a, b))
+    from_a = np.ones(len(merged), dtype=bool)
+    from_a[positions] = False
+    merged[positions] = b
+    merged[from_a] = a
+    return merged
+
+
+class HyperLogLog:
+    """Distinct count estimate with relative standard error ``1.04 / sqrt(2 ** precision)``."""
+
+    def __init__(self, precision=14):
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    def update(self, values):
+        if not len(values):
+            return self
+        p = self.precision
+        hashes = _hash(values)
+        index = (hashes >> np.uint64(64 - p)).astype(np.intp)
+        rest = hashes << np.uint64(p)
+        rank = np.minimum(64 - _bit_length(rest) + 1, 64 - p + 1).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+        return self
+
+    def merge(self, other):
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def estimate(self):
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if raw <= 2.5 * m and zeros:
+            return m * np.log(m / zeros)
+        return raw
+
+    @property
+    def relative_error(self):
+        """Relative standard error of ``estimate()``."""
+        return 1.04 / np.sqrt(len(self.registers))
+
+
+class QuantileSketch:
+    """Compactor-based (KLL-style) quantile sketch over numeric values.
+
+    Level ``h`` holds sorted items of weight ``2 ** h``; a level over ``k`` items keeps
+    every other item, from a random offset, and merges them into the level above. Each
+    compaction shifts any rank by at most the item weight. As with KLL's lowest levels,
+    an update of more than ``2 * sample * k`` values is first sampled down to one random
+    value per block of ``2 ** h``, which shifts a rank by a standard deviation of at most
+    ``2 ** h / 2`` per block. The accumulated variances bound the rank error, which
+    ``rank_error`` reports as a fraction of the count.
+    """
+
+    def __init__(self, k=2048, sample=16, seed=0):
+        self.k = k
+        self.sample = sample
+        self.levels = [np.empty(0)]
+        self.count = 0
+        self.min = np.inf
+        self.max = -np.inf
+        self._variance = 0.0
+        self._rng = np.random.default_rng(seed)
+
+    def update(self, values):
+        values = np.asarray(values, dtype='float64')
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return self
+        self.count += len(values)
+        self.min = min(self.min, values.min())
+        self.max = max(self.max, values.max())
+        h = max(int(np.log2(len(values) / (self.sample * self.k))), 0)
+        if h:
+            width = 1 << h
+            blocks = len(values) >> h
+            self._add(0, np.sort(values[blocks * width:]))
+            values = values[np.arange(blocks) * width + self._rng.integers(width, size=blocks)]
+            self._variance += blocks * 4.0 ** h / 4
+        self._add(h, np.sort(values))
+        self._compress()
+        return self
+
+    def merge(self, other):
+        for h, items in enumerate(other.levels):
+            self._add(h, items)
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._variance += other._variance
+        self._compress()
+        return self
+
+    def _add(self, h, items):
+        while len(self.levels) <= h:
+            self.levels.append(np.empty(0))
+        self.levels[h] = _merge_sorted(self.levels[h], items)
+
+    def _compress(self):
+        h = 0
+        while h < len(self.levels):
+            items = self.levels[h]
+            if len(items) > self.k:
+                keep = items[-1:] if len(items) % 2 else items[:0]
+                pairs = items[:len(items) - len(keep)]
+                self.levels[h] = keep
+                self._add(h + 1, pairs[self._rng.integers(2)::2])
+                self._variance += float(4 ** h)
+            h += 1
+
+    def quantile(self, q):
+        """Approximate value at quantile ``q`` (scalar or array)."""
+        if not self.count:
+            return np.full(np.shape(q), np.nan) if np.ndim(q) else np.nan
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(level), 2 ** h, dtype=np.float64)
+                                  for h, level in enumerate(self.levels)])
+        order = np.argsort(items, kind='stable')
+        items, cum = items[order], np.cumsum(weights[order])
+        index = np.searchsorted(cum, np.asarray(q) * cum[-1], side='left')
+        result = items[np.minimum(index, len(items) - 1)]
+        result = np.clip(result, self.min, self.max)
+        return result if np.ndim(q) else float(result)
+
+    @property
+    def rank_error(self):
+        """Two-sigma bound on the rank error, as a fraction of the count (0 when exact)."""
+        return 2 * np.sqrt(self._variance) / self.count if self.count else 0.0
+
+
+class FrequentItems:
+    """Misra-Gries / Space-Saving summary of the most frequent values.
+
+    Keeps at most ``capacity`` counters; every reported count is at most ``error`` below
+    the true count.
+    """
+
+    def __init__(self, capacity=256):
+        self.capacity = capacity
+        self.counts = pd.Series(dtype='float64')
+        self.error = 0.0
+        self.total = 0
+
+    def _reduce(self, counts):
+        if len(counts) > self.capacity:
+            threshold = counts.nlargest(self.capacity + 1).iloc[-1]
+            counts = counts[(counts > threshold).to_numpy()] - threshold
+            self.error += threshold
+        return counts
+
+    def _add(self, counts):
+        counts = self.counts.add(counts, fill_value=0) if len(self.counts) else counts
+        self.counts = self._reduce(counts)
+
+    def update(self, values):
+        counts = values.value_counts()
+        counts = counts[(counts > 0).to_numpy()].astype('float64')
+        self.total += int(counts.sum())
+        # Reducing the chunk first keeps the merge small for high-cardinality columns.
+        counts = self._reduce(counts)
+        counts.index = counts.index.astype(object)
+        self._add(counts)
+        return self
+
+    def merge(self, other):
+        self.total += other.total
+        self.error += other.error
+        self._add(other.counts)
+        return self
+
+    def top(self, k=10):
+        """The ``k`` most frequent values and their (under-)estimated counts."""
+        return self.counts.nlargest(k).astype('int64')
+
+
+def sketch_column(series, quantiles=True, top=True, distinct=True, chunk_rows=SKETCH_CHUNK_ROWS):
+    """Sketches ``series`` in one chunked pass.
+
+    Returns a dict with a distinct-count sketch (when ``distinct``), a quantile sketch
+    (numeric columns only, when ``quantiles``), a top-values sketch (when ``top``) and the
+    exact missing count.
+    """
+    distinct = HyperLogLog() if distinct else None
+    quantile_sketch = QuantileSketch() if quantiles else None
+    frequent = FrequentItems() if top else None
+    missing = 0
+    for start in range(0, len(series), chunk_rows):
+        chunk = series.iloc[start:start + chunk_rows]
+        valid = chunk.dropna()
+        missing += len(chunk) - len(valid)
+        if distinct is not None:
+            distinct.update(valid)
+        if quantile_sketch is not None:
+            quantile_sketch.update(valid.to_numpy(dtype='float64'))
+        if frequent is not None:
+            frequent.update(valid)
+    return {"distinct": distinct, "quantiles": quantile_sketch, "top": frequent, "missing": missing}
@@ -0,0 +1,99 @@
+"""Paginated table that keeps the data on the server and sends only the visible rows."""
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+import instrumentation as tr
+
+PAGE_SIZES = [25, 50, 100, 250, 500]
+DEFAULT_PAGE_SIZE = 100
+
+
+def sort_order(series):
+    """Row positions that sort ``series`` ascending, missing values last.
+
+    Returns ``(order, n_valid)`` where the first ``n_valid`` positions hold the
+    non-missing values.
+    """
+    if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+        values = series.to_numpy(dtype='float64', na_value=np.nan)
+        n_valid = int(np.count_nonzero(~np.isnan(values)))
+    else:
+        codes, uniques = pd.factorize(series, sort=True)
+        n_valid = int(np.count_nonzero(codes >= 0))
+        values = np.where(codes >= 0, codes, len(uniques))
+    return np.argsort(values, kind='stable'), n_valid
+
+
+@st.cache_resource(max_entries=16, show_spinner=False)
+def _cached_sort_order(_df, version, col):
+    return sort_order(_df[col])
+
+
+def get_sort_order(df, col, version=None):
+    """``sort_order`` of a column, shared across sessions and reruns per dataset version."""
+    if version is None:
+        return sort_order(df[col])
+    return _cached_sort_order(df, version, col)
+
+
+def window_positions(n_rows, start, stop, order=None, n_valid=None, ascending=True, rows=None):
+    """Positions of the rows shown in ``[start, stop)`` of the sorted, filtered view.
+
+    ``rows`` restricts the view to a subset of row positions; ``order`` comes from
+    ``sort_order``. Descending order keeps missing values last.
+    """
+    if order is None:
+        positions = np.arange(start, min(stop, n_rows if rows is None else len(rows)))
+        return positions if rows is None else np.asarray(rows)[positions]
+
+    if rows is not None:
+        keep = np.zeros(n_rows, dtype=bool)
+        keep[rows] = True
+        n_valid = int(np.count_nonzero(keep[order[:n_valid]]))
+        order = order[keep[order]]
+    index = np.arange(start, min(stop, len(order)))
+    if not ascending:
+        index = np.where(index < n_valid, n_valid - 1 - index, index)
+    return order[index]
+
+
+@tr.traced
+def render_table(df, key, version=None, rows=None, columns=None, height=400):
+    """Shows one page of ``df`` with server-side sorting and column selection.
+
+    Only the visible window of rows and the selected columns are sent to the browser,
+    so rendering cost does not grow with the dataset.
+    """
+    columns = list(df.columns) if columns is None else list(columns)
+    n_rows = len(df) if rows is None else len(rows)
+
+    c1, c2, c3, c4 = st.columns([2, 1, 1, 1])
+    with c1:
+        sort_col = st.selectbox("Sort By", ["(original order)"] + columns, key=f"{key}_sort")
+    with c2:
+        direction = st.radio("Direction", ["Ascending", "Descending"], horizontal=True,
+                             key=f"{key}_direction", disabled=sort_col == "(original order)")
+    with c3:
+        page_size = st.selectbox("Rows per Page", PAGE_SIZES,
+                                 index=PAGE_SIZES.index(DEFAULT_PAGE_SIZE), key=f"{key}_page_size")
+    n_pages = max(1, -(-n_rows // page_size))
+    if st.session_state.get(f"{key}_page", 1) > n_pages:
+        st.session_state[f"{key}_page"] = n_pages
+    with c4:
+        page = st.number_input(f"Page (of {n_pages:,})", min_value=1, max_value=n_pages,
+                               step=1, key=f"{key}_page")
+
+    start = (page - 1) * page_size
+    stop = start + page_size
+    if sort_col == "(original order)":
+        positions = window_positions(len(df), start, stop, rows=rows)
+    else:
+        order, n_valid = get_sort_order(df, sort_col, version)
+        positions = window_positions(len(df), start, stop, order, n_valid,
+                                     ascending=direction == "Ascending", rows=rows)
+
+    col_positions = df.columns.get_indexer(columns)
+    st.dataframe(df.iloc[positions, col_positions], width='stretch', height=height)
+    if n_rows:
+        st.caption(f"Rows {start + 1:,} to {start + len(positions):,} of {n_rows:,}")
@@ -0,0 +1,26 @@
+import io
+
+import pandas as pd
+import pytest
+
+import data_processing as dp
+
+
+@pytest.mark.parametrize("order, expected", [
+    # a, b, c, then the rows missing the key: the gaps at rows 1 and 3 take b's value.
+    (pd.Series(["b", None, "a", "c", None], dtype="category"), [1.0, 1.0]),
+    # False, True, True, then the missing keys: both gaps take row 4's value.
+    (pd.Series([True, None, False, None, True], dtype="boolean"), [5.0, 5.0]),
+])
+def test_fill_ordered_by_key_with_gaps(order, expected):
+    df = pd.DataFrame({"value": [1.0, None, 3.0, None, 5.0], "order": order})
+    _, fills = dp.plan_clean_missing(df, "ffill", ["value"], order_col="order")
+    assert fills["value"].tolist() == expected
+
+
+def test_date_only_csv_column_loads_as_datetime():
+    source = io.BytesIO(b"day,value\n2020-01-01,1\n,2\n2020-03-15,3\n")
+    df = dp.optimize_dtypes(dp.read_csv_streaming(source))
+    assert pd.api.types.is_datetime64_any_dtype(df["day"])
+    assert df["day"].isna().tolist() == [False, True, False]
+    assert df["day"].iloc[2] == pd.Timestamp("2020-03-15")
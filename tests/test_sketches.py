@@ -0,0 +1,29 @@
+import numpy as np
+import pandas as pd
+
+import sketches as sk
+
+
+def test_quantile_sketch_within_rank_error():
+    values = np.random.default_rng(0).lognormal(size=3_000_000)
+    sketch = sk.QuantileSketch()
+    for start in range(0, len(values), sk.SKETCH_CHUNK_ROWS):
+        sketch.update(values[start:start + sk.SKETCH_CHUNK_ROWS])
+    qs = np.array([0.1, 0.5, 0.9])
+    ranks = np.searchsorted(np.sort(values), sketch.quantile(qs)) / len(values)
+    assert np.all(np.abs(ranks - qs) <= sketch.rank_error)
+    assert all(np.all(np.diff(level) >= 0) for level in sketch.levels)
+
+
+def test_merged_sketches_cover_both_inputs():
+    values = np.random.default_rng(1).normal(size=200_000)
+    merged = sk.QuantileSketch(seed=1).update(values[:100_000]).merge(
+        sk.QuantileSketch(seed=2).update(values[100_000:]))
+    assert merged.count == len(values)
+    assert abs(np.mean(values <= merged.quantile(0.5)) - 0.5) <= merged.rank_error
+
+
+def test_distinct_estimate_within_error():
+    values = pd.Series([f"id_{i}" for i in range(200_000)] * 2, dtype="string")
+    sketch = sk.HyperLogLog().update(values)
+    assert abs(sketch.estimate() - 200_000) <= 3 * sketch.relative_error * 200_000
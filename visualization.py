@@ -1,8 +1,17 @@
+import functools
+import json
+import threading
 import streamlit as st
 import plotly.express as px
 import plotly.graph_objects as go
+import plotly.io as pio
+from plotly.subplots import make_subplots
 import pandas as pd
 import numpy as np
+import data_processing as dp
+import figure_cache
+import instrumentation as tr
+import out_of_core
 
 st.markdown("""
     <style>
@@ -14,16 +23,200 @@ st.markdown("""
 st.logo("assets/logo.svg",size="large")
 PLOTLY_TEMPLATE = "plotly_white"
 
-def plot_histogram(df, col):
-    """Plots a histogram with a marginal box plot for a numerical column."""
+_capture = threading.local()
+
+def _show(fig):
+    """Sends a figure to the browser, tracing its serialized size and the time to render it.
+
+    Inside a ``cached_figure`` call the serialized figure is also kept for the cache.
+    """
+    captured = getattr(_capture, "output", None)
+    if captured is not None or (tr.TRACE_ENABLED and tr.TRACE_PAYLOAD):
+        with tr.span("serialize_figure") as event:
+            spec = pio.to_json(fig, validate=False)
+            event["payload_bytes"] = len(spec)
+        if captured is not None:
+            captured["figures"].append(spec)
+    with tr.span("plotly_chart"):
+        st.plotly_chart(fig, width='stretch')
+
+def _note(text):
+    """Shows a caption under a figure; cached figures replay it."""
+    captured = getattr(_capture, "output", None)
+    if captured is not None:
+        captured["notes"].append(text)
+    st.caption(text)
+
+def _show_cached(figures, notes):
+    for spec in figures:
+        with tr.span("plotly_chart") as event:
+            event["payload_bytes"] = len(spec)
+            # The spec was validated when first built, so skip Plotly's validation pass.
+            st.plotly_chart(go.Figure(json.loads(spec), _validate=False), width='stretch')
+    for text in notes:
+        st.caption(text)
+
+def _freeze(value):
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+def cached_figure(func):
+    """Serves a plot from the figure cache when called again with the same ``version`` and
+    parameters, skipping figure construction and serialization.
+
+    Calls without a ``version`` always render from scratch.
+    """
+    @functools.wraps(func)
+    def wrapper(df, *args, **kwargs):
+        version = kwargs.get("version")
+        if version is None:
+            return func(df, *args, **kwargs)
+        key = (version, func.__name__, _freeze(args), _freeze(sorted(kwargs.items())))
+        try:
+            cached = figure_cache.get(key)
+        except TypeError:  # unhashable parameters
+            return func(df, *args, **kwargs)
+        if cached is not None:
+            _show_cached(*cached)
+            return None
+
+        previous = getattr(_capture, "output", None)
+        _capture.output = captured = {"figures": [], "notes": []}
+        try:
+            result = func(df, *args, **kwargs)
+        finally:
+            _capture.output = previous
+        # Calls that ended early with a message and no figure are cheap to repeat.
+        if captured["figures"]:
+            figure_cache.put(key, captured["figures"], captured["notes"])
+        return result
+    return wrapper
+
+HISTOGRAM_BINS = 50
+BOX_MAX_OUTLIERS = 500
+BOX_MAX_GROUPS = 50
+
+def _numeric_values(series):
+    """Returns the non-missing values of a column as a float64 array."""
+    values = series.to_numpy(dtype='float64', na_value=np.nan)
+    return values[np.isfinite(values)]
+
+def histogram_counts(df, col, bins=HISTOGRAM_BINS):
+    """Bins a numerical column with NumPy; returns ``(counts, edges)``."""
+    if out_of_core.is_out_of_core(df):
+        return df.histogram_counts(col, bins)
+    return np.histogram(_numeric_values(df[col]), bins=bins)
+
+def _box_stats(values, rng):
+    """Quartiles, whisker ends and a capped outlier sample for one array of values."""
+    q1, median, q3 = np.quantile(values, [0.25, 0.5, 0.75])
+    iqr = q3 - q1
+    is_outlier = (values < q1 - 1.5 * iqr) | (values > q3 + 1.5 * iqr)
+    inside = values[~is_outlier]
+    outliers = values[is_outlier]
+    if len(outliers) > BOX_MAX_OUTLIERS:
+        outliers = rng.choice(outliers, BOX_MAX_OUTLIERS, replace=False)
+    return {
+        'q1': q1, 'median': median, 'q3': q3, 'mean': values.mean(),
+        'lowerfence': inside.min(), 'upperfence': inside.max(),
+        'count': len(values), 'n_outliers': int(is_outlier.sum()), 'outliers': outliers,
+    }
+
+def box_summaries(df, col, category_col=None):
+    """Precomputes box plot statistics, one entry per group (or one for the whole column).
+
+    Returns a list of ``(label, stats)`` pairs; at most ``BOX_MAX_GROUPS`` of the largest
+    groups are kept.
+    """
+    if out_of_core.is_out_of_core(df):
+        return df.box_summaries(col, category_col)
+    rng = np.random.default_rng(0)
+    values = df[col].to_numpy(dtype='float64', na_value=np.nan)
+    finite = np.isfinite(values)
+    if not category_col:
+        return [(col, _box_stats(values[finite], rng))] if finite.any() else []
+
+    codes, labels = pd.factorize(df[category_col])
+    keep = finite & (codes >= 0)
+    codes, values = codes[keep], values[keep]
+    sizes = np.bincount(codes, minlength=len(labels))
+    order = np.argsort(codes, kind='stable')
+    groups = np.split(values[order], np.cumsum(sizes)[:-1])
+
+    largest = np.argsort(-sizes, kind='stable')[:BOX_MAX_GROUPS]
+    return [(str(labels[i]), _box_stats(groups[i], rng)) for i in sorted(largest) if sizes[i]]
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def _cached_histogram(_df, version, col, bins):
+    return histogram_counts(_df, col, bins)
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def _cached_box_summaries(_df, version, col, category_col):
+    return box_summaries(_df, col, category_col)
+
+def _box_traces(summaries, horizontal=False):
+    """Turns precomputed box statistics into Box traces plus outlier markers."""
+    palette = px.colors.qualitative.Plotly
+    traces = []
+    for i, (label, stats) in enumerate(summaries):
+        color = palette[i % len(palette)]
+        position = {'y' if horizontal else 'x': [label]}
+        traces.append(go.Box(
+            q1=[stats['q1']], median=[stats['median']], q3=[stats['q3']], mean=[stats['mean']],
+            lowerfence=[stats['lowerfence']], upperfence=[stats['upperfence']],
+            name=label, marker_color=color, orientation='h' if horizontal else 'v',
+            boxpoints=False, **position
+        ))
+        if len(stats['outliers']):
+            outliers = stats['outliers']
+            labels = [label] * len(outliers)
+            xy = {'x': outliers, 'y': labels} if horizontal else {'x': labels, 'y': outliers}
+            traces.append(go.Scatter(
+                mode='markers', marker={'color': color, 'size': 4}, showlegend=False,
+                name=f"{label} outliers ({stats['n_outliers']:,})", **xy
+            ))
+    return traces
+
+@tr.traced
+@cached_figure
+def plot_histogram(df, col, bins=HISTOGRAM_BINS, version=None):
+    """Plots a histogram with a marginal box plot for a numerical column.
+
+    Bin counts and box statistics are computed server-side and cached per dataset version.
+    """
     if col not in df.columns: return
-    fig = px.histogram(df, x=col, title=f"Distribution of {col}", marginal="box",
-                       template=PLOTLY_TEMPLATE)
-    fig.update_layout(bargap=0.1)
-    st.plotly_chart(fig, width='stretch')
+    if version is None:
+        counts, edges = histogram_counts(df, col, bins)
+        summaries = box_summaries(df, col)
+    else:
+        counts, edges = _cached_histogram(df, version, col, bins)
+        summaries = _cached_box_summaries(df, version, col, None)
+
+    fig = make_subplots(rows=2, cols=1, shared_xaxes=True, row_heights=[0.2, 0.8],
+                        vertical_spacing=0.03)
+    for trace in _box_traces(summaries, horizontal=True):
+        fig.add_trace(trace, row=1, col=1)
+    fig.add_trace(go.Bar(x=(edges[:-1] + edges[1:]) / 2, y=counts, name=col,
+                         customdata=np.column_stack([edges[:-1], edges[1:]]),
+                         hovertemplate='%{customdata[0]:.4g} to %{customdata[1]:.4g}<br>'
+                                       'Count: %{y:,}<extra></extra>'),
+                  row=2, col=1)
+    fig.update_layout(title=f"Distribution of {col}", template=PLOTLY_TEMPLATE,
+                      showlegend=False, bargap=0.1)
+    fig.update_yaxes(showticklabels=False, row=1, col=1)
+    fig.update_xaxes(title_text=col, row=2, col=1)
+    fig.update_yaxes(title_text='count', row=2, col=1)
+    _show(fig)
 
-def plot_box_plot(df, col, category_col=None):
-    """Plots a box plot for a numerical column, optionally grouped by a category."""
+@tr.traced
+@cached_figure
+def plot_box_plot(df, col, category_col=None, version=None):
+    """Plots a box plot for a numerical column, optionally grouped by a category.
+
+    Quartiles, fences and a capped outlier sample are computed server-side and cached per
+    dataset version.
+    """
     if col not in df.columns: return
 
     if category_col and category_col not in df.columns:
@@ -33,104 +226,389 @@ def plot_box_plot(df, col, category_col=None):
     if category_col:
         title += f" grouped by {category_col}"
 
-    fig = px.box(df, y=col, x=category_col, color=category_col,
-                 title=title, template=PLOTLY_TEMPLATE)
-    st.plotly_chart(fig, width='stretch')
+    if version is None:
+        summaries = box_summaries(df, col, category_col)
+    else:
+        summaries = _cached_box_summaries(df, version, col, category_col)
+
+    fig = go.Figure(_box_traces(summaries))
+    fig.update_layout(title=title, template=PLOTLY_TEMPLATE, yaxis_title=col,
+                      xaxis_title=category_col, showlegend=bool(category_col))
+    _show(fig)
+    if category_col and len(summaries) == BOX_MAX_GROUPS:
+        _note(f"Showing at most the {BOX_MAX_GROUPS} largest groups of {category_col}.")
+
+DENSITY_BINS = 100
+DENSITY_CHUNK_ROWS = 2_000_000
+
+def density_grid(df, x, y, bins=DENSITY_BINS, chunk_rows=DENSITY_CHUNK_ROWS):
+    """Counts (x, y) pairs on a ``bins`` x ``bins`` grid, ``chunk_rows`` rows at a time.
 
-def plot_density_heatmap(df, x, y):
-    """Plots a 2D density heatmap for two numerical variables."""
+    Returns ``(counts, x_edges, y_edges)`` with ``counts`` indexed as ``[y_bin, x_bin]``.
+    """
+    if out_of_core.is_out_of_core(df):
+        return df.density_grid(x, y, bins)
+    xs, ys, finite = _finite_xy(df, x, y)
+    xs, ys = xs[finite], ys[finite]
+    if not len(xs):
+        return np.zeros((bins, bins), dtype=np.int64), np.linspace(0, 1, bins + 1), np.linspace(0, 1, bins + 1)
+
+    bounds = [[xs.min(), xs.max()], [ys.min(), ys.max()]]
+    for axis in bounds:
+        if axis[0] == axis[1]:
+            axis[0], axis[1] = axis[0] - 0.5, axis[1] + 0.5
+
+    counts = np.zeros((bins, bins), dtype=np.int64)
+    for start in range(0, len(xs), chunk_rows):
+        chunk, x_edges, y_edges = np.histogram2d(
+            xs[start:start + chunk_rows], ys[start:start + chunk_rows], bins=bins, range=bounds
+        )
+        counts += chunk.astype(np.int64)
+    return counts.T, x_edges, y_edges
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def _cached_density_grid(_df, version, x, y, bins):
+    return density_grid(_df, x, y, bins)
+
+@tr.traced
+@cached_figure
+def plot_density_heatmap(df, x, y, bins=DENSITY_BINS, log_color=True, version=None):
+    """Plots a 2D density heatmap for two numerical variables.
+
+    Counts are binned server-side, so only the ``bins`` x ``bins`` grid reaches the browser.
+    """
     if x not in df.columns or y not in df.columns: return
-    
-    fig = px.density_heatmap(df, x=x, y=y, 
-                             title=f"2D Density Heatmap of {y} vs {x}",
-                             template=PLOTLY_TEMPLATE,
-                             color_continuous_scale="Viridis")
-    st.plotly_chart(fig, width='stretch')
 
-def plot_bar_chart_categorical(df, col, limit=15):
+    if version is None:
+        counts, x_edges, y_edges = density_grid(df, x, y, bins)
+    else:
+        counts, x_edges, y_edges = _cached_density_grid(df, version, x, y, bins)
+
+    z = counts.astype('float64')
+    colorbar = {'title': 'count'}
+    if log_color:
+        z = np.where(counts > 0, np.log10(np.maximum(counts, 1)), np.nan)
+        ticks = np.arange(0, int(np.log10(max(counts.max(), 1))) + 1)
+        colorbar = {'title': 'count', 'tickvals': ticks, 'ticktext': [f"{10 ** t:,}" for t in ticks]}
+
+    fig = go.Figure(go.Heatmap(
+        z=z,
+        x=(x_edges[:-1] + x_edges[1:]) / 2,
+        y=(y_edges[:-1] + y_edges[1:]) / 2,
+        customdata=counts,
+        colorscale="Viridis",
+        colorbar=colorbar,
+        hovertemplate=f'{x}: %{{x:.4g}}<br>{y}: %{{y:.4g}}<br>count: %{{customdata:,}}<extra></extra>'
+    ))
+    fig.update_layout(title=f"2D Density Heatmap of {y} vs {x}", template=PLOTLY_TEMPLATE,
+                      xaxis_title=x, yaxis_title=y)
+    _show(fig)
+
+@tr.traced
+@cached_figure
+def plot_bar_chart_categorical(df, col, limit=15, version=None):
     """Plots a bar chart for categorical data (top N values)."""
     if col not in df.columns: return
-    counts = df[col].dropna().value_counts().head(limit).reset_index()
+    if out_of_core.is_out_of_core(df):
+        counts = df.value_counts(col, limit)
+    else:
+        counts = df[col].dropna().value_counts().head(limit).reset_index()
     counts.columns = [col, 'Count']
     
     fig = px.bar(counts, x=col, y='Count', title=f"Top {limit} Values in {col}",
                  template=PLOTLY_TEMPLATE)
-    st.plotly_chart(fig, width='stretch')
+    _show(fig)
+
+SCATTER_WEBGL_MAX_POINTS = 200_000
+RASTER_SHAPE = (400, 600)
+RASTER_MAX_CATEGORIES = 10
+
+def _finite_xy(df, x, y):
+    """Returns float arrays for two columns plus a mask of rows where both are finite."""
+    xs = df[x].to_numpy(dtype='float64', na_value=np.nan)
+    ys = df[y].to_numpy(dtype='float64', na_value=np.nan)
+    return xs, ys, np.isfinite(xs) & np.isfinite(ys)
+
+def rasterize_points(xs, ys, codes=None, n_codes=1, shape=RASTER_SHAPE):
+    """Aggregates points into a pixel grid of counts with a single ``np.bincount`` pass.
+
+    Returns ``(counts, x_range, y_range)`` where ``counts`` has shape ``(n_codes, height,
+    width)`` and row 0 of each grid is the lowest y bin.
+    """
+    height, width = shape
+    x_range = (xs.min(), xs.max()) if len(xs) else (0.0, 1.0)
+    y_range = (ys.min(), ys.max()) if len(ys) else (0.0, 1.0)
+    x_span = (x_range[1] - x_range[0]) or 1.0
+    y_span = (y_range[1] - y_range[0]) or 1.0
+
+    ix = np.minimum(((xs - x_range[0]) / x_span * width).astype(np.int64), width - 1)
+    iy = np.minimum(((ys - y_range[0]) / y_span * height).astype(np.int64), height - 1)
+    flat = iy * width + ix
+    if codes is not None:
+        flat += codes.astype(np.int64) * (height * width)
+    counts = np.bincount(flat, minlength=n_codes * height * width)
+    return counts.reshape(n_codes, height, width), x_range, y_range
+
+def _category_codes(values, max_categories=RASTER_MAX_CATEGORIES):
+    """Codes the most frequent categories 0..k-1 and lumps the rest (and missing) into 'Other'."""
+    series = pd.Series(values)
+    top = series.value_counts().index[:max_categories].tolist()
+    codes = pd.Categorical(series, categories=top).codes.astype(np.int64)
+    labels = [str(label) for label in top]
+    if (codes == -1).any():
+        codes[codes == -1] = len(top)
+        labels.append('Other')
+    return codes, labels
+
+def _hex_to_rgb(color):
+    color = color.lstrip('#')
+    return [int(color[i:i + 2], 16) for i in (0, 2, 4)]
 
-def plot_scatter(df, x, y, color=None):
-    """Plots a scatter plot for bivariate analysis."""
+def _raster_figure(xs, ys, color_values, title, x, y):
+    """Builds a density image of the points, shaded by log count and tinted by category."""
+    height, width = RASTER_SHAPE
+    if color_values is None:
+        counts, x_range, y_range = rasterize_points(xs, ys)
+        total = counts[0]
+        dx = (x_range[1] - x_range[0]) / width
+        dy = (y_range[1] - y_range[0]) / height
+        fig = go.Figure(go.Heatmap(
+            z=np.where(total > 0, np.log10(np.maximum(total, 1)), np.nan).astype(np.float32),
+            x0=x_range[0] + dx / 2, dx=dx, y0=y_range[0] + dy / 2, dy=dy,
+            colorscale='Viridis',
+            colorbar={'title': 'log10(count)'},
+            hovertemplate=f'{x}: %{{x}}<br>{y}: %{{y}}<br>log10(count): %{{z:.2f}}<extra></extra>'
+        ))
+    else:
+        codes, labels = _category_codes(color_values)
+        counts, x_range, y_range = rasterize_points(xs, ys, codes, len(labels))
+        palette = px.colors.qualitative.Plotly[:RASTER_MAX_CATEGORIES]
+        colors = [palette[i % len(palette)] for i in range(len(labels))]
+        if labels[-1] == 'Other':
+            colors[-1] = '#7f7f7f'
+        rgb = np.array([_hex_to_rgb(c) for c in colors], dtype='float64')
+
+        total = counts.sum(axis=0)
+        mixed = np.einsum('khw,kc->hwc', counts, rgb) / np.maximum(total, 1)[..., None]
+        alpha = np.log1p(total) / np.log1p(max(total.max(), 1))
+        image = np.dstack([mixed, alpha * 255]).astype(np.uint8)
+
+        dx = (x_range[1] - x_range[0]) / width
+        dy = (y_range[1] - y_range[0]) / height
+        fig = go.Figure(go.Image(
+            z=image, colormodel='rgba',
+            x0=x_range[0] + dx / 2, dx=dx or 1, y0=y_range[0] + dy / 2, dy=dy or 1,
+            hoverinfo='skip'
+        ))
+        # Empty traces give the image a legend of category colours.
+        for label, color in zip(labels, colors):
+            fig.add_trace(go.Scatter(x=[None], y=[None], mode='markers', name=label,
+                                     marker={'color': color, 'size': 10}))
+        fig.update_layout(showlegend=True)
+
+    fig.update_layout(title=title, template=PLOTLY_TEMPLATE, xaxis_title=x, yaxis_title=y)
+    fig.update_yaxes(autorange=True)
+    return fig
+
+@tr.traced
+@cached_figure
+def plot_scatter(df, x, y, color=None, max_points=SCATTER_WEBGL_MAX_POINTS, version=None):
+    """Plots a scatter plot for bivariate analysis.
+
+    Up to ``max_points`` rows are drawn with WebGL; larger frames are rasterized
+    server-side into a density image so the payload stays bounded.
+    """
     if x not in df.columns or y not in df.columns: return
     plot_color = color if color in df.columns else None
-    
-    fig = px.scatter(df, x=x, y=y, color=plot_color, 
-                     title=f"{y} vs {x} (Scatter Plot)",
-                     template=PLOTLY_TEMPLATE)
-    st.plotly_chart(fig, width='stretch')
 
-def plot_correlation_heatmap(df):
-    """Plots a correlation heatmap for all numerical columns."""
+    if len(df) <= max_points:
+        fig = px.scatter(df, x=x, y=y, color=plot_color, 
+                         title=f"{y} vs {x} (Scatter Plot)",
+                         template=PLOTLY_TEMPLATE, render_mode='webgl')
+    else:
+        xs, ys, finite = _finite_xy(df, x, y)
+        color_values = df[plot_color].to_numpy()[finite] if plot_color else None
+        fig = _raster_figure(xs[finite], ys[finite], color_values,
+                             f"{y} vs {x} (Density of {finite.sum():,} points)", x, y)
+    _show(fig)
+
+CORRELATION_ANNOTATE_MAX_COLS = 30
+
+@tr.traced
+@cached_figure
+def plot_correlation_heatmap(df, method="pearson", clustered=False, version=None):
+    """Plots a correlation heatmap for all numerical columns.
+
+    The matrix comes from the cached NumPy correlation engine; cells are only annotated
+    while the matrix is small enough to read.
+    """
     num_cols = df.select_dtypes(include='number').columns
     if len(num_cols) < 2:
         st.info("Not enough numerical columns (requires at least 2) for correlation heatmap.")
         return
     
-    corr = df[num_cols].corr()
+    corr, order = dp.get_correlation(df, method, version)
+    if clustered:
+        corr = corr.loc[order, order]
     
     fig = px.imshow(
-        corr, 
-        text_auto=".2f", 
+        corr.astype('float32'), 
+        text_auto=".2f" if len(corr) <= CORRELATION_ANNOTATE_MAX_COLS else False, 
         aspect="auto", 
         color_continuous_scale=px.colors.diverging.RdBu,
-        title="Correlation Heatmap (Numerical Columns)",
+        zmin=-1,
+        zmax=1,
+        title=f"{method.title()} Correlation Heatmap (Numerical Columns)",
         template=PLOTLY_TEMPLATE
     )
-    fig.update_layout(xaxis={'side': 'bottom'}, height=600)
-    st.plotly_chart(fig, width='stretch')
+    fig.update_layout(xaxis={'side': 'bottom'}, height=600 if len(corr) <= 50 else 900)
+    _show(fig)
 
-def plot_missing_data_heatmap(df):
-    """Plots a heatmap showing the location of missing values across columns."""
-    if df.isnull().sum().sum() == 0:
-        st.success("No missing data to plot!")
+MISSING_HEATMAP_BINS = 1000
+
+def missing_data_bins(df, bins=MISSING_HEATMAP_BINS, row_range=None):
+    """Buckets rows into at most ``bins`` bins and returns the fraction missing per cell.
+
+    Returns ``(fractions, starts, stops)`` where ``fractions`` has one row per column and one
+    column per bin, and each bin covers rows ``starts[i]`` up to ``stops[i]``.
+    """
+    start, stop = row_range or (0, len(df))
+    n_rows = stop - start
+    if n_rows <= 0:
+        return np.zeros((df.shape[1], 0)), np.array([], dtype=np.int64), np.array([], dtype=np.int64)
+    edges = np.unique(np.linspace(0, n_rows, min(bins, n_rows) + 1).astype(np.int64))
+    starts, stops = edges[:-1], edges[1:]
+    sizes = stops - starts
+
+    fractions = np.empty((df.shape[1], len(starts)))
+    for i, col in enumerate(df.columns):
+        mask = df[col].iloc[start:stop].isna().to_numpy()
+        fractions[i] = np.add.reduceat(mask, starts, dtype=np.int64) / sizes
+    return fractions, starts + start, stops + start
+
+@tr.traced
+@cached_figure
+def plot_missing_data_heatmap(df, bins=MISSING_HEATMAP_BINS, row_range=None, version=None):
+    """Plots a heatmap of the fraction of missing values per column across row bins.
+
+    The figure always has at most ``bins`` columns, whatever the row count; ``row_range``
+    re-bins a ``(start, stop)`` slice of rows to zoom in.
+    """
+    if df.empty:
         return
-        
-    missing_df = df.isnull().astype(int)
-    
+    fractions, starts, stops = missing_data_bins(df, bins, row_range)
+    if not fractions.any():
+        start, stop = row_range or (0, len(df))
+        if (start, stop) == (0, len(df)):
+            st.success("No missing data to plot!")
+        elif stop > start:
+            st.success(f"No missing values in rows {start:,}–{stop - 1:,}.")
+        else:
+            st.info("The selected row range is empty.")
+        return
+
     fig = go.Figure(data=go.Heatmap(
-        z=missing_df.T.values, 
-        x=missing_df.index.tolist(),
-        y=missing_df.columns.tolist(),
-        colorscale=[[0, 'blue'], [1, 'red']], 
-        showscale=False
+        z=fractions,
+        x=starts,
+        y=df.columns.tolist(),
+        customdata=np.broadcast_to(stops - 1, fractions.shape),
+        colorscale=[[0, 'blue'], [1, 'red']],
+        zmin=0,
+        zmax=1,
+        colorbar={'title': 'Missing', 'tickformat': '.0%'},
+        hovertemplate='Rows %{x}-%{customdata}<br>%{y}: %{z:.1%} missing<extra></extra>'
     ))
     
     fig.update_layout(
         title='Missing Data Pattern (Red = Missing)',
-        xaxis_title='Row Index',
+        xaxis_title='Row Position (binned)',
         yaxis_title='Column',
         height=700,
         template=PLOTLY_TEMPLATE,
         yaxis={'tickangle': -45}
     )
-    st.plotly_chart(fig, width='stretch')
+    _show(fig)
+
+PAIRPLOT_MAX_COLS = 8
+PAIRPLOT_POINT_BUDGET = 20_000
+PAIRPLOT_BIN_ROWS = 500_000
+PAIRPLOT_BINS = 40
 
-def plot_pairplot(df):
-    """Plots a scatter matrix (pair plot) for up to 5 numerical columns."""
+def sample_rows(df, n, seed=0):
+    """Uniform random sample of at most ``n`` rows, kept in their original order."""
+    if len(df) <= n:
+        return df
+    positions = np.sort(np.random.default_rng(seed).choice(len(df), n, replace=False))
+    return df.iloc[positions]
+
+def _binned_pairplot(df, dims):
+    """Pair plot grid with histograms on the diagonal and 2D-binned density below it."""
+    k = len(dims)
+    values = {col: df[col].to_numpy(dtype='float64', na_value=np.nan) for col in dims}
+    fig = make_subplots(rows=k, cols=k, horizontal_spacing=0.02, vertical_spacing=0.02)
+
+    for i, y_col in enumerate(dims):
+        for j, x_col in enumerate(dims[:i + 1]):
+            if i == j:
+                col_values = values[x_col][np.isfinite(values[x_col])]
+                counts, edges = np.histogram(col_values, bins=PAIRPLOT_BINS)
+                fig.add_trace(go.Bar(x=(edges[:-1] + edges[1:]) / 2, y=counts, name=x_col,
+                                     marker_color='#636efa', showlegend=False),
+                              row=i + 1, col=j + 1)
+                continue
+            xs, ys = values[x_col], values[y_col]
+            finite = np.isfinite(xs) & np.isfinite(ys)
+            if not finite.any():
+                continue
+            counts, x_edges, y_edges = np.histogram2d(xs[finite], ys[finite], bins=PAIRPLOT_BINS)
+            fig.add_trace(go.Heatmap(
+                z=np.where(counts.T > 0, np.log10(np.maximum(counts.T, 1)), np.nan).astype(np.float32),
+                x=(x_edges[:-1] + x_edges[1:]) / 2,
+                y=(y_edges[:-1] + y_edges[1:]) / 2,
+                colorscale='Viridis', showscale=False,
+                hovertemplate=f'{x_col}: %{{x:.4g}}<br>{y_col}: %{{y:.4g}}<extra></extra>'
+            ), row=i + 1, col=j + 1)
+
+    for idx, col in enumerate(dims):
+        fig.update_xaxes(title_text=col, row=k, col=idx + 1)
+        fig.update_yaxes(title_text=col, row=idx + 1, col=1)
+    fig.update_layout(bargap=0.05)
+    return fig
+
+@tr.traced
+@cached_figure
+def plot_pairplot(df, cols=None, point_budget=PAIRPLOT_POINT_BUDGET, version=None):
+    """Plots a pair plot for the chosen numerical columns (first 5 by default).
+
+    Frames within ``point_budget`` rows get a full scatter matrix. Larger ones are
+    sampled down to at most ``PAIRPLOT_BIN_ROWS`` rows and drawn as binned densities
+    with histograms on the diagonal, so cost does not grow with the row count.
+    """
     num_cols = df.select_dtypes(include='number').columns
     
     if len(num_cols) < 2:
         st.info("Need at least 2 numerical columns for a Pair Plot.")
         return
 
-    dimensions_to_plot = num_cols[:5].tolist()
+    dimensions_to_plot = (cols or num_cols[:5].tolist())[:PAIRPLOT_MAX_COLS]
+    if len(dimensions_to_plot) < 2:
+        st.info("Select at least 2 numerical columns for a Pair Plot.")
+        return
     
-    fig = px.scatter_matrix(
-        df, 
-        dimensions=dimensions_to_plot, 
-        title="Pair Plot (First 5 Numerical Columns)", 
-        height=800,
-        template=PLOTLY_TEMPLATE
-    )
-    fig.update_traces(diagonal_visible=False, showupperhalf=False)
+    if len(df) <= point_budget:
+        fig = px.scatter_matrix(
+            df, 
+            dimensions=dimensions_to_plot, 
+            title="Pair Plot", 
+            height=800,
+            template=PLOTLY_TEMPLATE
+        )
+        fig.update_traces(diagonal_visible=False, showupperhalf=False)
+    else:
+        sample = sample_rows(df[dimensions_to_plot], PAIRPLOT_BIN_ROWS)
+        fig = _binned_pairplot(sample, dimensions_to_plot)
+        fig.update_layout(title=f"Pair Plot (binned density of {len(sample):,} sampled rows)",
+                          height=800, template=PLOTLY_TEMPLATE)
     fig.update_layout(title_x=0.5)
     
-    st.plotly_chart(fig, width='stretch')
\ No newline at end of file
+    _show(fig)